@@ -0,0 +1,133 @@
+"""响应序列化微基准：对比旧的“构造模型 + response_model再校验 + jsonable_encoder”路径与validated_json
+
+用法：
+    python -m benchmarks.serialization_bench --page-sizes 10,100 --output serialization.json
+
+只测量把存储层返回的行变成响应体字节的CPU开销，不包含存储查询和HTTP处理。
+旧路径按FastAPI处理response_model的方式模拟：先把路由返回的模型对象转成dict，
+再按response_model校验一次，最后用jsonable_encoder编码并交给JSONResponse。
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from benchmarks.storage_bench import synthetic_song, measure, git_commit
+from models.bangdream_models import (
+    SongResponse, SongPartial, PaginatedResponse, DEFAULT_SONG_LIST_FIELDS
+)
+from services.json_response import validated_json, orjson
+
+
+def storage_rows(count: int, lyrics_chars: int, seed: int) -> List[Dict[str, Any]]:
+    """模拟存储层返回的行：时间戳为ISO字符串"""
+    rng = random.Random(seed)
+    now = datetime.now().isoformat()
+    return [dict(synthetic_song(rng, lyrics_chars), id=i + 1, created_at=now, updated_at=now) for i in range(count)]
+
+
+@lru_cache(maxsize=None)
+def response_field(response_type) -> TypeAdapter:
+    """FastAPI在注册路由时为response_model建好校验器，这里同样只建一次"""
+    return TypeAdapter(response_type)
+
+
+def legacy_response_model(response_type, content: Any, exclude_unset: bool = False) -> bytes:
+    """旧路径：路由返回的模型对象再按response_model校验并编码"""
+    adapter = response_field(response_type)
+    validated = adapter.validate_python(jsonable_encoder(content, exclude_unset=exclude_unset))
+    return JSONResponse(content=jsonable_encoder(validated, exclude_unset=exclude_unset)).body
+
+
+def bench_page(rows: List[Dict[str, Any]], iterations: int) -> Dict[str, Any]:
+    """一页歌曲列表（默认字段，不含歌词）"""
+    page = [{name: row[name] for name in DEFAULT_SONG_LIST_FIELDS} for row in rows]
+
+    def legacy(i):
+        # 缓存未命中时的旧路径：逐行构造SongPartial，再整体jsonable_encoder
+        content = PaginatedResponse(songs=[SongPartial(**row) for row in page], total=len(page),
+                                    page_index=1, page_size=len(page), next_cursor=None)
+        return JSONResponse(content=jsonable_encoder(content, exclude_unset=True)).body
+
+    def fast(i):
+        content = {"songs": page, "total": len(page), "page_index": 1, "page_size": len(page), "next_cursor": None}
+        return validated_json(PaginatedResponse, content, exclude_unset=True)
+
+    assert json.loads(legacy(0)) == json.loads(fast(0))
+    return {"legacy": measure(legacy, iterations), "validated_json": measure(fast, iterations)}
+
+
+def bench_songs(rows: List[Dict[str, Any]], iterations: int) -> Dict[str, Any]:
+    """完整歌曲（含歌词）列表，对应PATCH /songs的响应"""
+    def legacy(i):
+        return legacy_response_model(List[SongResponse], [SongResponse(**row) for row in rows])
+
+    def fast(i):
+        return validated_json(List[SongResponse], rows)
+
+    assert json.loads(legacy(0)) == json.loads(fast(0))
+    return {"legacy": measure(legacy, iterations), "validated_json": measure(fast, iterations)}
+
+
+def bench_detail(row: Dict[str, Any], iterations: int) -> Dict[str, Any]:
+    """单首歌曲详情"""
+    def legacy(i):
+        return legacy_response_model(SongResponse, SongResponse(**row))
+
+    def fast(i):
+        return validated_json(SongResponse, row)
+
+    assert json.loads(legacy(0)) == json.loads(fast(0))
+    return {"legacy": measure(legacy, iterations), "validated_json": measure(fast, iterations)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="响应序列化微基准")
+    parser.add_argument("--page-sizes", default="10,100", help="逗号分隔的每页行数")
+    parser.add_argument("--iterations", type=int, default=500, help="每种路径的调用次数")
+    parser.add_argument("--lyrics-chars", type=int, default=1200, help="平均歌词长度（字符）")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="-", help="结果JSON文件路径，- 表示标准输出")
+    args = parser.parse_args()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "orjson": orjson is not None,
+        "platform": platform.platform(),
+        "iterations": args.iterations,
+        "lyrics_chars": args.lyrics_chars,
+        "results": []
+    }
+    for page_size in (int(s) for s in args.page_sizes.split(",")):
+        print("运行每页 %d 行..." % page_size, file=sys.stderr)
+        rows = storage_rows(page_size, args.lyrics_chars, args.seed)
+        report["results"].append({
+            "page_size": page_size,
+            "song_list_page": bench_page(rows, args.iterations),
+            "full_songs": bench_songs(rows, args.iterations),
+            "song_detail": bench_detail(rows[0], args.iterations)
+        })
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output == "-":
+        print(output)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""存储层微基准：对比DatabaseManager、FileManager与MemoryManager在不同数据规模下的性能
+
+用法：
+    python -m benchmarks.storage_bench --sizes 1000,100000,1000000 --output bench.json
+
+每个(存储类型, 数据规模)组合在独立子进程中运行，以便分别统计峰值RSS。
+结果以JSON输出，可在不同提交之间比较。
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from queue import Empty
+from datetime import datetime
+from typing import Callable, Dict, List, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BANDS = ["MyGO!!!!!", "Ave Mujica", "Poppin'Party", "Roselia", "Afterglow"]
+# 合成歌词使用的字符：常用汉字、假名和少量英文
+LYRIC_CHARS = "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放决西被干做必战先回则任取据处队南给色光门即保治北造百规热领七海口东导器压志世金增争济阶油思术极交受联什认六共权收证改清己美再采转更单风切打白教速花带安场身车例真务具万每目至达走积示议声报斗完类八离华名确才科张信马节话米整空元况今集温传土许步群广石记需段研界拉林律叫且究观越织装影算低持音众书布复容儿须际商非验连断深难近矿千周委素技备半办青省列习响约支般史感劳便团往酸历市克何除消构府称太准精值号率族维划选标写存候毛亲快效斯院查江型眼王按格养易置派层片始却专状育厂京识适属圆包火住调满县局照参红细引听该铁价严ラブライブ"
+TITLE_WORDS = ["春日影", "迷星叫", "碧天伴走", "影色舞", "栞", "歌いましょう", "壱雫空", "潜在表明",
+               "Sophie", "KiLLKiSS", "Imprisoned", "Symbol", "Crucifix", "Mayoiuta", "Haruhikage",
+               "Legend", "Yes", "Fire", "Bird", "Neo", "Aspirations", "Jumping", "Sunshine", "Moon"]
+
+
+def synthetic_song(rng: random.Random, lyrics_chars: int) -> Dict[str, Any]:
+    """生成一首合成歌曲，歌词长度服从对数正态分布（均值约为lyrics_chars）"""
+    title = " ".join(rng.sample(TITLE_WORDS, rng.randint(1, 3))) + " " + str(rng.randint(1, 99999))
+    length = max(50, int(rng.lognormvariate(0, 0.5) * lyrics_chars * 0.88))
+    lines = []
+    remaining = length
+    while remaining > 0:
+        n = min(remaining, rng.randint(8, 24))
+        lines.append("".join(rng.choices(LYRIC_CHARS, k=n)))
+        remaining -= n
+    return {
+        "title": title,
+        "author": rng.choice(["Doloris", "MyGO!!!!!", "Elements Garden", "CRYCHIC", None]),
+        "lyrics": "\n".join(lines),
+        "band": rng.choice(BANDS)
+    }
+
+
+def measure(func: Callable[[int], Any], iterations: int) -> Dict[str, float]:
+    """调用func(i) iterations次，统计延迟分位数和吞吐"""
+    samples = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        func(i)
+        samples.append(time.perf_counter() - t0)
+    total = time.perf_counter() - start
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "p50_ms": samples[len(samples) // 2] * 1000,
+        "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000,
+        "mean_ms": sum(samples) / len(samples) * 1000,
+        "ops_per_sec": iterations / total if total > 0 else 0.0
+    }
+
+
+def populate(create_bulk: Callable[[List[Dict]], Any], size: int, lyrics_chars: int, seed: int) -> float:
+    """分批写入合成数据，返回耗时（秒）"""
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    batch = []
+    for _ in range(size):
+        batch.append(synthetic_song(rng, lyrics_chars))
+        if len(batch) >= 5000:
+            create_bulk(batch)
+            batch = []
+    if batch:
+        create_bulk(batch)
+    return time.perf_counter() - start
+
+
+def bench_database(workdir: str, size: int, iterations: int, lyrics_chars: int, seed: int) -> Dict[str, Any]:
+    """对DatabaseManager的各个公开方法计时"""
+    from services.db_manager import DatabaseManager
+
+    db = DatabaseManager(os.path.join(workdir, "band.db"))
+    db.initialize()
+    # 歌曲通过band_id引用乐队，先补齐合成数据用到的乐队
+    with db.get_connection() as conn:
+        conn.executemany("INSERT OR IGNORE INTO bands (name, description) VALUES (?, '')", [(name,) for name in BANDS])
+        conn.commit()
+    load_seconds = populate(db.create_songs_bulk, size, lyrics_chars, seed)
+    rng = random.Random(seed + 1)
+    total = size
+    pages = max(1, total // 10)
+
+    results = {
+        "get_songs": measure(lambda i: db.get_songs(page_index=rng.randint(1, min(pages, 100))), iterations),
+        "get_songs_deep_offset": measure(lambda i: db.get_songs(page_index=pages), iterations),
+        "get_songs_cursor": measure(lambda i: db.get_songs(after_id=rng.randint(0, total)), iterations),
+        "get_songs_band": measure(lambda i: db.get_songs(band=rng.choice(BANDS)), iterations),
+        "get_songs_title": measure(lambda i: db.get_songs(title="春日影 " + str(rng.randint(1, 99999))), iterations),
+        "get_songs_summary_fields": measure(
+            lambda i: db.get_songs(page_index=rng.randint(1, min(pages, 100)), fields=["id", "title", "band"]), iterations),
+        "get_song_by_id": measure(lambda i: db.get_song_by_id(rng.randint(1, total)), iterations),
+        "search_songs": measure(lambda i: db.search_songs(rng.choice(TITLE_WORDS)[:3]), iterations),
+    }
+    created = []
+    results["create_song"] = measure(
+        lambda i: created.append(db.create_song(synthetic_song(rng, lyrics_chars))["id"]), iterations)
+    results["update_song"] = measure(lambda i: db.update_song(created[i], {"title": "updated " + str(i)}), iterations)
+    results["delete_song"] = measure(lambda i: db.delete_song(created[i]), iterations)
+    db.close()
+    return {"load_seconds": load_seconds, "disk_bytes": os.path.getsize(os.path.join(workdir, "band.db")), "ops": results}
+
+
+def bench_file(workdir: str, size: int, iterations: int, lyrics_chars: int, seed: int, storage_mode: str) -> Dict[str, Any]:
+    """对FileManager的各个公开方法计时"""
+    from services.file_manager import FileManager
+    return bench_song_store(lambda: FileManager(data_dir=workdir, storage_mode=storage_mode),
+                            workdir, size, iterations, lyrics_chars, seed)
+
+
+def bench_memory(workdir: str, size: int, iterations: int, lyrics_chars: int, seed: int) -> Dict[str, Any]:
+    """对MemoryManager的各个公开方法计时（快照只在关闭时写入，不计入写操作耗时）"""
+    from services.memory_manager import MemoryManager
+    managers = []
+
+    def make_manager():
+        manager = MemoryManager(data_dir=workdir, snapshot_interval=3600, snapshot_writes=2 ** 62)
+        managers.append(manager)
+        return manager
+
+    result = bench_song_store(make_manager, workdir, size, iterations, lyrics_chars, seed)
+    managers[-1].close()
+    return result
+
+
+def bench_song_store(make_manager: Callable, workdir: str, size: int, iterations: int, lyrics_chars: int, seed: int) -> Dict[str, Any]:
+    """FileManager及其子类共用的计时流程"""
+    fm = make_manager()
+    fm.initialize()
+    for name in BANDS:
+        if fm.get_band_by_name(name) is None:
+            fm.create_band({"name": name, "description": ""})
+    load_seconds = populate(fm.create_songs_bulk, size, lyrics_chars, seed)
+    if hasattr(fm, "close"):
+        # 内存存储需要先落盘，冷启动才能读到数据
+        fm.close()
+    # 冷启动：新实例从磁盘解析全部数据
+    start = time.perf_counter()
+    fm = make_manager()
+    fm.initialize()
+    fm.get_all_songs()
+    cold_start_seconds = time.perf_counter() - start
+    rng = random.Random(seed + 1)
+    total = size
+
+    results = {
+        "get_all_songs": measure(lambda i: fm.get_all_songs(), iterations),
+        "get_songs_by_band": measure(lambda i: fm.get_songs_by_band(rng.choice(BANDS)), iterations),
+        "get_song_by_id": measure(lambda i: fm.get_song_by_id(rng.randint(1, total)), iterations),
+        "search_songs_by_title": measure(lambda i: fm.search_songs_by_title(rng.choice(TITLE_WORDS)), iterations),
+    }
+    created = []
+    results["create_song"] = measure(
+        lambda i: created.append(fm.create_song(synthetic_song(rng, lyrics_chars))["id"]), iterations)
+    results["update_song"] = measure(lambda i: fm.update_song(created[i], {"title": "updated " + str(i)}), iterations)
+    results["delete_song"] = measure(lambda i: fm.delete_song(created[i]), iterations)
+    disk_bytes = sum(os.path.getsize(os.path.join(workdir, name)) for name in os.listdir(workdir))
+    return {"load_seconds": load_seconds, "cold_start_seconds": cold_start_seconds, "disk_bytes": disk_bytes, "ops": results}
+
+
+def run_case(backend: str, size: int, iterations: int, lyrics_chars: int, seed: int, queue):
+    """子进程入口：运行一个组合并回报结果和峰值RSS"""
+    with tempfile.TemporaryDirectory(prefix="storage_bench_") as workdir:
+        if backend == "db":
+            result = bench_database(workdir, size, iterations, lyrics_chars, seed)
+        elif backend == "memory":
+            result = bench_memory(workdir, size, iterations, lyrics_chars, seed)
+        else:
+            result = bench_file(workdir, size, iterations, lyrics_chars, seed, backend.split(":", 1)[1])
+    # Linux上ru_maxrss单位为KB，macOS上为字节
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != "darwin":
+        max_rss *= 1024
+    result["peak_rss_bytes"] = max_rss
+    queue.put(result)
+
+
+def git_commit() -> str:
+    """当前提交号，不在git仓库中时返回空字符串"""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="存储层微基准")
+    parser.add_argument("--sizes", default="1000,100000,1000000", help="逗号分隔的歌曲数量")
+    parser.add_argument("--backends", default="db,file:snapshot,file:journal,memory",
+                        help="逗号分隔：db、file:snapshot、file:journal、memory")
+    parser.add_argument("--iterations", type=int, default=200, help="每个方法的调用次数")
+    parser.add_argument("--lyrics-chars", type=int, default=1200, help="平均歌词长度（字符）")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="-", help="结果JSON文件路径，- 表示标准输出")
+    args = parser.parse_args()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "iterations": args.iterations,
+        "lyrics_chars": args.lyrics_chars,
+        "results": []
+    }
+    ctx = multiprocessing.get_context("spawn")
+    for size in (int(s) for s in args.sizes.split(",")):
+        for backend in args.backends.split(","):
+            print("运行 %s, %d 首歌曲..." % (backend, size), file=sys.stderr)
+            queue = ctx.Queue()
+            proc = ctx.Process(target=run_case, args=(backend, size, args.iterations, args.lyrics_chars, args.seed, queue))
+            proc.start()
+            while True:
+                try:
+                    result = queue.get(timeout=1)
+                    break
+                except Empty:
+                    if not proc.is_alive():
+                        raise RuntimeError("%s/%d 子进程异常退出（退出码 %s）" % (backend, size, proc.exitcode))
+            proc.join()
+            report["results"].append(dict(backend=backend, size=size, **result))
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output == "-":
+        print(output)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
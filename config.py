@@ -0,0 +1,71 @@
+import os
+
+# 数据库连接池配置（可通过环境变量覆盖）
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5.0"))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_CACHED_STATEMENTS = int(os.getenv("DB_CACHED_STATEMENTS", "256"))
+
+# 文件存储配置
+# snapshot：每次写入重写整个JSON文件；journal：变更以NDJSON追加到日志，定期压缩为快照
+FILE_STORAGE_MODE = os.getenv("FILE_STORAGE_MODE", "snapshot")
+FILE_JOURNAL_MAX_BYTES = int(os.getenv("FILE_JOURNAL_MAX_BYTES", str(16 * 1024 * 1024)))
+FILE_JOURNAL_MAX_RATIO = float(os.getenv("FILE_JOURNAL_MAX_RATIO", "1.0"))
+FILE_JOURNAL_MIN_RECORDS = int(os.getenv("FILE_JOURNAL_MIN_RECORDS", "1000"))
+FILE_JOURNAL_FSYNC = os.getenv("FILE_JOURNAL_FSYNC", "0") == "1"
+
+# 文件存储版本的模糊标题搜索
+FUZZY_SCORE_CUTOFF = int(os.getenv("FUZZY_SCORE_CUTOFF", "60"))
+
+# 异步存储接口的专用I/O线程数
+DB_IO_WORKERS = int(os.getenv("DB_IO_WORKERS", str(DB_POOL_SIZE)))
+# 文件存储只用一个I/O线程，文件读写天然串行化
+FILE_IO_WORKERS = int(os.getenv("FILE_IO_WORKERS", "1"))
+
+# 批量导入/导出的批大小（每批一个事务）
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "500"))
+
+# 读接口的响应缓存（LRU），按条目数和总字节数限制
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# 存储后端：db（SQLite）、file（JSON文件）、memory（常驻内存，定期快照到JSON文件）
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "db")
+
+# 内存存储每隔多少秒或累计多少次写入把快照写回磁盘
+MEMORY_SNAPSHOT_INTERVAL = float(os.getenv("MEMORY_SNAPSHOT_INTERVAL", "5.0"))
+MEMORY_SNAPSHOT_WRITES = int(os.getenv("MEMORY_SNAPSHOT_WRITES", "1000"))
+
+# SQLite组提交写队列：开启后单个写线程把并发的写操作合并到一个事务中提交
+DB_WRITE_QUEUE = os.getenv("DB_WRITE_QUEUE", "0") == "1"
+# 每批最多合并的写操作数，以及第一个操作入队后最多等待的毫秒数
+DB_WRITE_BATCH_SIZE = int(os.getenv("DB_WRITE_BATCH_SIZE", "64"))
+DB_WRITE_BATCH_DELAY_MS = float(os.getenv("DB_WRITE_BATCH_DELAY_MS", "2"))
+
+# 歌词压缩：超过阈值的歌词以zlib压缩后存储，逐行记录编码，未压缩的旧数据照常读取
+LYRICS_COMPRESSION = os.getenv("LYRICS_COMPRESSION", "1") == "1"
+LYRICS_COMPRESS_MIN_BYTES = int(os.getenv("LYRICS_COMPRESS_MIN_BYTES", "256"))
+LYRICS_COMPRESS_LEVEL = int(os.getenv("LYRICS_COMPRESS_LEVEL", "6"))
+
+# 准入控制：按路径前缀限制同时处理的请求数，格式为“前缀=并发数:排队上限”，逗号分隔，留空关闭。
+# 排队超过ADMISSION_QUEUE_TIMEOUT_MS毫秒或队列已满时直接返回503和Retry-After（秒）。
+# 按最长前缀匹配；流式导出和批量导入在整个传输期间占用名额，单独给一个小的限制，不占用普通读写的名额
+ADMISSION_LIMITS = os.getenv(
+    "ADMISSION_LIMITS", "/api/songs/export=2:2,/api/songs/bulk=2:2,/api/songs=16:64,/api/bands=8:32")
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "1000"))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+
+# 响应压缩：按Accept-Encoding选择brotli（已安装时）或gzip，只压缩不小于阈值的响应体。
+# 带ETag的响应压缩结果按(ETag, 编码)缓存
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+COMPRESSION_CACHE_MAX_ENTRIES = int(os.getenv("COMPRESSION_CACHE_MAX_ENTRIES", "1024"))
+COMPRESSION_CACHE_MAX_BYTES = int(os.getenv("COMPRESSION_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# 性能分析：PROFILING=1时所有响应带Server-Timing头（存储、校验、序列化耗时），
+# 请求带PROFILE_HEADER头或按PROFILE_SAMPLE_RATE被抽中时用cProfile分析整个请求，结果写入PROFILE_DIR
+PROFILING = os.getenv("PROFILING", "0") == "1"
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "X-Profile")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
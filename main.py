@@ -1,16 +1,51 @@
-from fastapi import FastAPI
+import time
+
+# 从导入应用模块开始计时，在lifespan中报告启动耗时
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 import os
+from contextlib import asynccontextmanager
+from services.metrics import MetricsMiddleware, REGISTRY
+from services.admission import AdmissionMiddleware
+from services.compression import CompressionMiddleware
+from services.json_response import FastJSONResponse
+from services.profiling import ProfilingMiddleware
+from config import STORAGE_BACKEND, PROFILING
+
+# 存储后端由环境变量STORAGE_BACKEND选择：db、file或memory
+STORAGE_DESCRIPTIONS = {"db": "数据库版本", "file": "文件存储版本", "memory": "内存存储版本"}
+STORAGE_TYPES = {"db": "database", "file": "file", "memory": "memory"}
+if STORAGE_BACKEND not in STORAGE_DESCRIPTIONS:
+    raise ValueError("未知的存储后端: " + STORAGE_BACKEND)
 
-# 决定使用文件存储版本还是数据库版本
-USE_FILE_STORAGE = False
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 存储初始化（迁移、准备数据文件）推迟到这里，导入应用模块时不做I/O
+    started = time.perf_counter()
+    await startup_storage()
+    ready = time.perf_counter()
+    print("存储初始化耗时 %.1f ms，启动总耗时 %.1f ms" % ((ready - started) * 1000, (ready - IMPORT_STARTED) * 1000))
+    yield
+    # 关闭存储层的专用I/O线程
+    shutdown_storage()
 
 app = FastAPI(
+    lifespan=lifespan,
+    # 未自行构造响应的接口也使用更快的JSON编码
+    default_response_class=FastJSONResponse,
     title="BanG Dream! 乐队管理系统",
-    description="基于FastAPI的乐队和歌曲管理API" + ("（文件存储版本）" if USE_FILE_STORAGE else "（数据库版本）"),
+    description="基于FastAPI的乐队和歌曲管理API" + "（" + STORAGE_DESCRIPTIONS[STORAGE_BACKEND] + "）",
     version="1.0.0"
 )
 
+# 性能分析在最内层，只统计真正处理请求的耗时，不含排队和压缩
+if PROFILING:
+    app.add_middleware(ProfilingMiddleware)
+# 准入控制在CORS之内，被拒绝的503响应同样带CORS头
+app.add_middleware(AdmissionMiddleware)
 # 配置CORS
 app.add_middleware(
     CORSMiddleware,
@@ -19,25 +54,43 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# 在准入控制之外压缩响应，压缩不占用存储路由的并发名额
+app.add_middleware(CompressionMiddleware)
+# 最外层记录每个路由的请求耗时
+app.add_middleware(MetricsMiddleware)
 
 # 根据配置注册不同的路由
-if USE_FILE_STORAGE:
-    from routers.band_with_file import router as band_router
+if STORAGE_BACKEND == "file":
+    from routers.band_with_file import router as band_router, startup_storage, shutdown_storage
     print("使用文件存储版本")
+elif STORAGE_BACKEND == "memory":
+    from routers.band_with_memory import router as band_router, startup_storage, shutdown_storage
+    print("使用内存存储版本")
 else:
-    from routers.band_with_db import router as band_router
+    from routers.band_with_db import router as band_router, startup_storage, shutdown_storage
+    from services.db_pool import PoolTimeoutError
     print("使用数据库版本")
 
+    @app.exception_handler(PoolTimeoutError)
+    async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+        # 连接池耗尽时快速返回503，而不是让请求一直挂起
+        return JSONResponse(status_code=503, content={"detail": "数据库繁忙，请稍后重试"})
+
 app.include_router(band_router)
 
 @app.get("/")
 async def root():
-    return {"message": "BanG Dream! 乐队管理系统API", "storage_type": "file" if USE_FILE_STORAGE else "database"}
+    return {"message": "BanG Dream! 乐队管理系统API", "storage_type": STORAGE_TYPES[STORAGE_BACKEND]}
 
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus文本格式的监控指标"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
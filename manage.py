@@ -0,0 +1,178 @@
+"""管理命令
+
+用法：
+    python manage.py migrate            # 把数据库迁移到最新版本（应用启动时也会自动执行）
+    python manage.py seed               # 写入示例乐队和歌曲，已有数据时跳过
+    python manage.py version            # 显示数据库当前的结构版本
+    python manage.py compress-lyrics    # 压缩已有的未压缩歌词，报告转换前后的大小和读取耗时
+    python manage.py check-indexes      # 检查歌曲列表各种过滤和排序组合都走索引，没有全表扫描和多余的排序
+
+--backend 指定存储后端（db、file或memory），默认取环境变量STORAGE_BACKEND；
+file和memory共用同一份数据文件。
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+from config import STORAGE_BACKEND
+
+
+def open_storage(backend: str):
+    """按后端创建存储管理器并完成初始化"""
+    if backend == "db":
+        from services.db_manager import DatabaseManager
+        manager = DatabaseManager()
+    else:
+        from services.file_manager import FileManager
+        manager = FileManager()
+    manager.initialize()
+    return manager
+
+
+def cmd_migrate(args) -> int:
+    if args.backend != "db":
+        print("文件存储没有结构迁移")
+        return 0
+    from services.db_manager import DatabaseManager
+    manager = DatabaseManager()
+    start = time.perf_counter()
+    manager.initialize()
+    print("数据库已是最新版本，耗时 %.1f ms" % ((time.perf_counter() - start) * 1000))
+    manager.close()
+    return 0
+
+
+def cmd_seed(args) -> int:
+    manager = open_storage(args.backend)
+    if args.backend == "db":
+        bands, songs = manager.seed()
+        print("新增 %d 个乐队、%d 首歌曲" % (bands, songs))
+        manager.close()
+    else:
+        print("新增 %d 个乐队" % manager.seed())
+    return 0
+
+
+def cmd_version(args) -> int:
+    if args.backend != "db":
+        print("文件存储没有结构版本")
+        return 0
+    from services.db_manager import DatabaseManager
+    from services.migrations import current_version, LATEST_VERSION
+    manager = DatabaseManager()
+    with manager.get_connection() as conn:
+        version = current_version(conn)
+    manager.close()
+    print("当前版本 %d，最新版本 %d" % (version, LATEST_VERSION))
+    return 0 if version == LATEST_VERSION else 1
+
+
+def storage_size(manager, backend: str) -> int:
+    """数据文件占用的字节数（数据库含WAL文件，文件存储含日志）"""
+    if backend == "db":
+        paths = [manager.db_path, manager.db_path + "-wal"]
+    else:
+        paths = [manager.song_file, manager.journal_file]
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+
+def median_ms(func, iterations: int) -> float:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def measure_reads(manager, backend: str) -> dict:
+    """读取耗时：导出全部歌曲（含歌词）、歌曲详情，以及不含歌词的列表页或冷启动解析"""
+    from models.bangdream_models import DEFAULT_SONG_LIST_FIELDS
+    song_ids = [song["id"] for batch in manager.iter_song_batches() for song in batch]
+    rng = random.Random(42)
+    result = {
+        "export_ms": median_ms(lambda: [batch for batch in manager.iter_song_batches()], 3),
+        "detail_ms": median_ms(lambda: manager.get_song_by_id(rng.choice(song_ids)), 200) if song_ids else 0.0
+    }
+    if backend == "db":
+        result["list_page_ms"] = median_ms(lambda: manager.get_songs(fields=DEFAULT_SONG_LIST_FIELDS), 50)
+    else:
+        from services.file_manager import FileManager
+
+        def cold_load():
+            fresh = FileManager(manager.data_dir, storage_mode=manager.storage_mode)
+            fresh.initialize()
+            fresh.get_all_songs()
+        result["cold_load_ms"] = median_ms(cold_load, 3)
+    return result
+
+
+def cmd_compress_lyrics(args) -> int:
+    manager = open_storage(args.backend)
+    size_before = storage_size(manager, args.backend)
+    reads_before = measure_reads(manager, args.backend)
+    start = time.perf_counter()
+    checked, converted, lyrics_before, lyrics_after = manager.compress_existing_lyrics()
+    elapsed = time.perf_counter() - start
+    if args.backend == "db" and args.vacuum:
+        # 压缩释放的页只有VACUUM后才会还给文件系统
+        with manager.get_connection() as conn:
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    size_after = storage_size(manager, args.backend)
+    reads_after = measure_reads(manager, args.backend)
+
+    print("检查 %d 首歌曲，压缩 %d 首，耗时 %.1f ms" % (checked, converted, elapsed * 1000))
+    if converted:
+        print("歌词 %d -> %d 字节（%.1f%%）" % (lyrics_before, lyrics_after, lyrics_after * 100.0 / lyrics_before))
+    print("数据文件 %d -> %d 字节" % (size_before, size_after))
+    for key in reads_before:
+        print("%s %.3f -> %.3f" % (key, reads_before[key], reads_after[key]))
+    if args.backend == "db":
+        manager.close()
+    return 0
+
+
+def cmd_check_indexes(args) -> int:
+    if args.backend != "db":
+        print("文件存储没有查询计划")
+        return 0
+    # 检查逻辑与tests/test_song_list_plans.py共用，这里用于检查实际数据库（统计信息不同，计划可能不同）
+    from tests.test_song_list_plans import song_list_plans
+    from services.db_manager import DatabaseManager
+    manager = DatabaseManager()
+    manager.initialize()
+    checked = failed = 0
+    for description, query, plan, problems in song_list_plans(manager):
+        checked += 1
+        if problems:
+            failed += 1
+            print("查询计划有问题: " + description)
+            print("    " + query)
+            print("    " + " | ".join(plan))
+    manager.close()
+    print("检查 %d 条查询，%d 条有全表扫描或多余排序" % (checked, failed))
+    return 1 if failed else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="BanG Dream! 乐队管理系统管理命令")
+    parser.add_argument("--backend", default=STORAGE_BACKEND, choices=("db", "file", "memory"))
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("migrate", help="把数据库迁移到最新版本").set_defaults(func=cmd_migrate)
+    subparsers.add_parser("seed", help="写入示例数据").set_defaults(func=cmd_seed)
+    subparsers.add_parser("version", help="显示数据库结构版本").set_defaults(func=cmd_version)
+    compress = subparsers.add_parser("compress-lyrics", help="压缩已有的歌词并报告大小和读取耗时")
+    compress.add_argument("--vacuum", action="store_true", help="转换后执行VACUUM回收空间（仅数据库）")
+    compress.set_defaults(func=cmd_compress_lyrics)
+    subparsers.add_parser("check-indexes", help="检查歌曲列表各种过滤和排序组合的查询计划，有全表扫描或多余排序时返回1") \
+        .set_defaults(func=cmd_check_indexes)
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
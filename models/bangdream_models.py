@@ -17,6 +17,10 @@ class BandResponse(BandBase):
     class Config:
         from_attributes = True
 
+class BandStatsResponse(BandResponse):
+    song_count: int
+    last_updated: Optional[datetime] = None
+
 class SongBase(BaseModel):
     title: str
     author: Optional[str] = None
@@ -32,6 +36,10 @@ class SongUpdate(BaseModel):
     lyrics: Optional[str] = None
     band: Optional[str] = None
 
+class SongBatchUpdate(SongUpdate):
+    """PATCH /songs批量更新中的一项"""
+    id: int
+
 class SongResponse(SongBase):
     id: int
     created_at: datetime
@@ -40,8 +48,66 @@ class SongResponse(SongBase):
     class Config:
         from_attributes = True
 
+# 歌曲列表可选择的字段；列表默认不返回歌词
+SONG_FIELDS = ("id", "title", "author", "lyrics", "band", "created_at", "updated_at")
+DEFAULT_SONG_LIST_FIELDS = ("id", "title", "author", "band", "created_at", "updated_at")
+
+def parse_song_fields(fields: Optional[str]) -> List[str]:
+    """解析逗号分隔的fields参数，id总会被包含；含未知字段时抛出ValueError"""
+    if fields is None:
+        return list(DEFAULT_SONG_LIST_FIELDS)
+    selected = ["id"]
+    for name in fields.split(","):
+        name = name.strip()
+        if not name or name in selected:
+            continue
+        if name not in SONG_FIELDS:
+            raise ValueError("未知字段: " + name)
+        selected.append(name)
+    return selected
+
+class SongPartial(BaseModel):
+    """列表中的歌曲，只包含fields=选择的字段（序列化时排除未设置的字段）"""
+    id: int
+    title: Optional[str] = None
+    author: Optional[str] = None
+    lyrics: Optional[str] = None
+    band: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    score: Optional[float] = None  # 搜索相关度，越大越相关
+    snippet: Optional[str] = None  # 全文检索命中片段，关键词以<mark>标记
+
 class PaginatedResponse(BaseModel):
-    songs: List[SongResponse]
+    songs: List[SongPartial]
     total: int
     page_index: int
-    page_size: int
\ No newline at end of file
+    page_size: int
+    next_cursor: Optional[int] = None  # 游标分页：下一页请求时作为after_id传入
+
+class SongChange(BaseModel):
+    """变更流中的一项：deleted为True时是墓碑，只有id、change_seq和deleted_at"""
+    id: int
+    change_seq: int
+    deleted: bool
+    title: Optional[str] = None
+    author: Optional[str] = None
+    lyrics: Optional[str] = None
+    band: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    deleted_at: Optional[datetime] = None
+
+class ChangeFeedResponse(BaseModel):
+    changes: List[SongChange]
+    next_since: int  # 下次同步时作为since传入
+    has_more: bool  # 为True时立即用next_since继续拉取
+
+class BulkError(BaseModel):
+    index: int  # 请求体中的行号（从0开始）
+    error: str
+
+class BulkImportResponse(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[BulkError]
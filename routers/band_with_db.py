@@ -1,88 +1,177 @@
-from fastapi import APIRouter, HTTPException, Query
-from typing import Optional, List
+from fastapi import APIRouter, HTTPException, Query, Request
+from typing import Optional, List, Union, Literal
+from fastapi.responses import StreamingResponse
 from logging import log
 
 from models.bangdream_models import (
-    BandResponse, SongCreate, SongResponse, SongUpdate, PaginatedResponse
+    BandResponse, BandStatsResponse, SongCreate, SongResponse, SongUpdate, SongBatchUpdate, PaginatedResponse,
+    BulkImportResponse, ChangeFeedResponse, parse_song_fields
 )
-from services.db_manager import DatabaseManager
+from services.response_cache import ResponseCache, cached_json_response
+from services.json_response import FastJSONResponse, validated_json
+from services.bulk_import import bulk_import_songs, export_songs_ndjson
+from services.async_storage import AsyncDatabaseManager
+from services.metrics import register_stats_gauge
 
 router = APIRouter(prefix="/api", tags=["bands"])
-db_manager = DatabaseManager()
+# 读接口的响应缓存，按数据版本号失效
+response_cache = ResponseCache()
+db_manager = AsyncDatabaseManager()
+register_stats_gauge("response_cache_stats", "响应缓存统计", response_cache.stats, ("entries", "bytes", "hits", "misses"))
+register_stats_gauge("db_pool_stats", "数据库连接池统计", db_manager.manager.get_pool_stats,
+                     ("created", "in_use", "idle", "acquired", "waits", "timeouts"))
 
 
-@router.get("/bands", response_model=List[BandResponse])
-def get_bands(name: Optional[str] = Query(None)):
+@router.get("/bands", response_model=Union[List[BandStatsResponse], List[BandResponse]])
+async def get_bands(
+    request: Request,
+    name: Optional[str] = Query(None),
+    with_stats: bool = Query(False, description="附带每个乐队的歌曲数和最近更新时间")
+):
     """获取所有乐队或按名称查询特定乐队"""
-    res = []
-    if name is not None:
-        res = db_manager.get_band_by_name(name=name)
-        if res is not None:
-            return [BandResponse(**res)]
-        else:
-            raise HTTPException(status_code=404, detail="乐队不存在")
-    else:
-        res = db_manager.get_all_bands()
-        if res is not None:
-            return [BandResponse(**item) for item in res]
-            # log(msg=str(res), level=1)
+    async def build():
+        res = []
+        if name is not None:
+            res = await db_manager.get_band_by_name(name=name, with_stats=with_stats)
+            if res is not None:
+                return [res]
+            else:
+                raise HTTPException(status_code=404, detail="乐队不存在")
         else:
-            raise HTTPException(status_code=404, detail="乐队不存在")
+            res = await db_manager.get_all_bands(with_stats=with_stats)
+            if res is not None:
+                return res
+                # log(msg=str(res), level=1)
+            else:
+                raise HTTPException(status_code=404, detail="乐队不存在")
 
+    response_type = List[BandStatsResponse] if with_stats else List[BandResponse]
+    return await cached_json_response(request, response_cache, await db_manager.get_data_version(), build, response_type)
 
-@router.get("/songs", response_model=PaginatedResponse)
-def get_songs(
+
+@router.get("/songs", response_model=PaginatedResponse, response_model_exclude_unset=True)
+async def get_songs(
+    request: Request,
     band: Optional[str] = Query(None),
     title: Optional[str] = Query(None),
+    author: Optional[str] = Query(None),
+    title_prefix: Optional[str] = Query(None, min_length=1, description="标题前缀"),
+    sort: Literal["id", "title", "created_at", "updated_at"] = Query("id", description="排序字段"),
+    order: Literal["asc", "desc"] = Query("asc", description="排序方向"),
     page_index: int = Query(1, ge=1),
-    page_size: int = Query(10, ge=1, le=100)
+    page_size: int = Query(10, ge=1, le=100),
+    after_id: Optional[int] = Query(None, ge=0, description="游标分页：返回ID大于该值的歌曲"),
+    q: Optional[str] = Query(None, min_length=1, description="全文检索标题和歌词，支持前缀和\"短语\""),
+    fields: Optional[str] = Query(None, description="逗号分隔的返回字段，如id,title,lyrics；默认不返回歌词")
 ):
-    """获取歌曲列表（支持分页和过滤）"""
-    res = db_manager.get_songs(band, title, page_index, page_size)
-    if res is not None:
-        content, size = res
-        return PaginatedResponse(songs=[SongResponse(**cont) for cont in content], page_size=page_size, page_index=page_index, total=size)
-    else:
-        raise HTTPException(status_code=404, detail="乐队不存在")
+    """获取歌曲列表（乐队、作者、标题和标题前缀可组合过滤，支持排序和分页）"""
+    try:
+        selected = parse_song_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if after_id is not None and (sort != "id" or order == "desc"):
+        raise HTTPException(status_code=400, detail="游标分页只支持按ID升序")
+
+    async def build():
+        if q is not None:
+            # 全文检索按相关度排序，只支持页码分页
+            content, size = await db_manager.search_songs(q, page_index, page_size, selected)
+            return {"songs": content, "page_size": page_size, "page_index": page_index, "total": size, "next_cursor": None}
+        res = await db_manager.get_songs(band, title, page_index, page_size, after_id, selected,
+                                         author, title_prefix, sort, order == "desc")
+        if res is not None:
+            content, size, next_cursor = res
+            return {"songs": content, "page_size": page_size, "page_index": page_index, "total": size, "next_cursor": next_cursor}
+        else:
+            raise HTTPException(status_code=404, detail="乐队不存在")
+
+    # 行数据只校验一次，且只序列化被选择的字段
+    return await cached_json_response(request, response_cache, await db_manager.get_data_version(), build,
+                                      PaginatedResponse, exclude_unset=True)
+
+
+@router.post("/songs/bulk", response_model=BulkImportResponse)
+async def bulk_import(request: Request):
+    """批量导入歌曲（NDJSON或JSON数组），返回逐行错误"""
+    return await bulk_import_songs(request, db_manager.create_songs_bulk)
+
+
+@router.get("/songs/export")
+async def export_songs():
+    """以NDJSON流式导出全部歌曲"""
+    return StreamingResponse(export_songs_ndjson(db_manager.iter_song_batches()), media_type="application/x-ndjson")
+
+
+@router.get("/songs/changes", response_model=ChangeFeedResponse, response_model_exclude_unset=True)
+async def get_song_changes(
+    request: Request,
+    since: int = Query(0, ge=0, description="上次同步返回的next_since，0表示从头开始"),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """增量同步：返回变更序号大于since的新建、修改的歌曲和删除墓碑，按序号升序"""
+    async def build():
+        changes, next_since, has_more = await db_manager.get_changes(since, limit)
+        return {"changes": changes, "next_since": next_since, "has_more": has_more}
+
+    return await cached_json_response(request, response_cache, await db_manager.get_data_version(), build,
+                                      ChangeFeedResponse, exclude_unset=True)
 
 
 @router.get("/songs/{song_id}", response_model=SongResponse)
-def get_song(song_id: int):
+async def get_song(song_id: int):
     """根据ID获取歌曲详情"""
-    song = db_manager.get_song_by_id(song_id)
+    song = await db_manager.get_song_by_id(song_id)
     if not song:
         raise HTTPException(status_code=404, detail="歌曲不存在")
-    return song
+    return FastJSONResponse(validated_json(SongResponse, song))
 
 
 @router.post("/songs", response_model=SongResponse, status_code=201)
-def create_song(song: SongCreate):
+async def create_song(song: SongCreate):
     """创建新歌曲"""
-    res = db_manager.create_song(song.model_dump())
-    if res != 0:  # Success
-        band = db_manager.get_song_by_id(res)
-        if band is not None:
-            return SongResponse(**band)
-        else:
-            raise HTTPException(status_code=404, detail="歌曲不存在")
-    else:
-        raise HTTPException(status_code=400, detail="请求格式错误")
+    res = await db_manager.create_song(song.model_dump())
+    if res is None:
+        raise HTTPException(status_code=400, detail="乐队不存在")
+    return FastJSONResponse(validated_json(SongResponse, res), status_code=201)
+
+
+@router.patch("/songs", response_model=List[SongResponse])
+async def update_songs(updates: List[SongBatchUpdate]):
+    """在一个事务中批量更新歌曲，任一项失败则全部不生效"""
+    songs, errors = await db_manager.update_songs_batch([update.model_dump() for update in updates])
+    if errors:
+        raise HTTPException(status_code=404, detail=[{"index": index, "error": error} for index, error in errors])
+    return FastJSONResponse(validated_json(List[SongResponse], songs))
 
 
 @router.put("/songs/{song_id}", response_model=SongResponse)
-def update_song(song_id: int, song: SongUpdate):
+async def update_song(song_id: int, song: SongUpdate):
     """更新歌曲信息"""
-    res = db_manager.update_song(song_id, song.model_dump())
-    if res != 0:
-        song_data = db_manager.get_song_by_id(song_id)
-        if song_data is not None:
-            return SongResponse(**song_data)
+    song_data = await db_manager.update_song(song_id, song.model_dump())
+    if song_data is None:
         raise HTTPException(status_code=404, detail="歌曲不存在")
+    return FastJSONResponse(validated_json(SongResponse, song_data))
 
 
 @router.delete("/songs/{song_id}", status_code=204)
-def delete_song(song_id: int):
+async def delete_song(song_id: int):
     """删除歌曲"""
-    res = db_manager.delete_song(song_id)
+    res = await db_manager.delete_song(song_id)
     if not res:
         raise HTTPException(status_code=404, detail="歌曲不存在")
+
+
+@router.get("/db/pool")
+async def get_pool_stats():
+    """获取数据库连接池统计信息"""
+    return await db_manager.get_pool_stats()
+
+
+async def startup_storage():
+    """迁移数据库结构，由应用启动时的lifespan调用"""
+    await db_manager.startup()
+
+
+def shutdown_storage():
+    """关闭I/O线程和数据库连接"""
+    db_manager.shutdown()
@@ -0,0 +1,15 @@
+from routers.file_routes import create_router
+from services.async_storage import AsyncMemoryManager
+
+memory_manager = AsyncMemoryManager()
+router = create_router(memory_manager, "内存存储版本")
+
+
+async def startup_storage():
+    """把数据载入内存，由应用启动时的lifespan调用"""
+    await memory_manager.startup()
+
+
+def shutdown_storage():
+    """关闭I/O线程并写入最后一次快照"""
+    memory_manager.shutdown()
@@ -0,0 +1,184 @@
+from bisect import bisect_right
+from typing import Optional, List, Union, Literal
+
+from fastapi import APIRouter, HTTPException, Query, Request, Path
+from fastapi.responses import StreamingResponse
+
+from config import FUZZY_SCORE_CUTOFF
+from models.bangdream_models import (
+    BandResponse, BandStatsResponse, SongCreate, SongResponse, SongUpdate, SongBatchUpdate, PaginatedResponse,
+    BulkImportResponse, ChangeFeedResponse, parse_song_fields
+)
+from services.async_storage import AsyncFileManager
+from services.bulk_import import bulk_import_songs, export_songs_ndjson
+from services.file_manager import FileManager
+from services.json_response import FastJSONResponse, validated_json
+from services.metrics import register_stats_gauge
+from services.response_cache import ResponseCache, cached_json_response
+
+
+def create_router(storage: AsyncFileManager, tag: str) -> APIRouter:
+    """文件存储和内存存储共用的路由，storage为AsyncFileManager或AsyncMemoryManager"""
+    router = APIRouter(prefix="/api", tags=[tag])
+    # 读接口的响应缓存，按数据版本号失效
+    response_cache = ResponseCache()
+    register_stats_gauge("response_cache_stats", "响应缓存统计", response_cache.stats,
+                         ("entries", "bytes", "hits", "misses"))
+
+    @router.get("/bands", response_model=Union[List[BandStatsResponse], List[BandResponse]])
+    async def get_bands(
+        request: Request,
+        name: Optional[str] = Query(None, description="乐队名称"),
+        with_stats: bool = Query(False, description="附带每个乐队的歌曲数和最近更新时间")
+    ):
+        """获取乐队列表或根据名称查询特定乐队"""
+        async def build():
+            if name is None:
+                # Get List
+                return await storage.get_all_bands(with_stats)
+            else:
+                some_band = await storage.get_band_by_name(name, with_stats)
+                if some_band is None:
+                    raise HTTPException(status_code=404, detail="乐队不存在")
+                return [some_band]
+
+        response_type = List[BandStatsResponse] if with_stats else List[BandResponse]
+        return await cached_json_response(request, response_cache, await storage.get_data_version(), build,
+                                          response_type)
+
+
+    @router.get("/songs", response_model=PaginatedResponse, response_model_exclude_unset=True)
+    async def get_songs(
+        request: Request,
+        band: Optional[str] = Query(None, description="乐队名称"),
+        title: Optional[str] = Query(None, description="歌曲名称（模糊搜索）"),
+        author: Optional[str] = Query(None, description="作者"),
+        title_prefix: Optional[str] = Query(None, min_length=1, description="标题前缀"),
+        sort: Optional[Literal["id", "title", "created_at", "updated_at"]] = Query(
+            None, description="排序字段，默认按ID（只有标题搜索时按相关度）"),
+        order: Literal["asc", "desc"] = Query("asc", description="排序方向"),
+        page_index: int = Query(1, ge=1, description="页码"),
+        page_size: int = Query(10, ge=1, le=100, description="每页数量"),
+        after_id: Optional[int] = Query(None, ge=0, description="游标分页：返回ID大于该值的歌曲"),
+        q: Optional[str] = Query(None, min_length=1, description="模糊搜索标题和作者，按相关度排序"),
+        fields: Optional[str] = Query(
+            None, description="逗号分隔的返回字段，如id,title,lyrics；默认不返回歌词")
+    ):
+        """获取歌曲列表，支持乐队、标题、作者和标题前缀组合过滤、排序和分页"""
+        try:
+            selected = parse_song_fields(fields)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if after_id is not None and (sort not in (None, "id") or order == "desc"):
+            raise HTTPException(status_code=400, detail="游标分页只支持按ID升序")
+
+        async def build():
+            if q is not None:
+                # 与数据库版本一致：按相关度排序，只支持页码分页
+                hits = await storage.search_songs_by_title(
+                    q, limit=None, score_cutoff=FUZZY_SCORE_CUTOFF, include_author=True)
+                start = (page_index-1)*page_size
+                result = [FileManager.project_song(hit, selected) for hit in hits[start:start+page_size]]
+                return {"songs": result, "page_index": page_index, "page_size": page_size, "total": len(hits),
+                        "next_cursor": None}
+
+            # 搜索结果按相关度排序，游标分页需要按ID排序
+            by_id = sort == "id" or (sort is None and (title is None or after_id is not None))
+            songs = await storage.query_songs(
+                band, title, author, title_prefix, "id" if by_id else sort, order == "desc",
+                score_cutoff=FUZZY_SCORE_CUTOFF)
+
+            if after_id is not None:
+                # 游标模式：歌曲按ID递增存储，二分定位到after_id之后
+                start = bisect_right(songs, after_id, key=lambda k: k["id"])
+            else:
+                start = (page_index-1)*page_size
+                if start > len(songs):
+                    raise HTTPException(status_code=400, detail="请求参数错误")
+            end = min(start + page_size, len(songs))
+            # 只对当前页做字段投影，缓存中的完整数据不被复制
+            result = [FileManager.project_song(songs[i], selected) for i in range(start, end)]
+
+            next_cursor = None
+            if end < len(songs) and by_id and order == "asc":
+                next_cursor = songs[end-1]["id"]
+
+            return {"songs": result, "page_index": page_index, "page_size": page_size, "total": len(songs),
+                    "next_cursor": next_cursor}
+
+        # 行数据只校验一次，且只序列化被选择的字段
+        return await cached_json_response(request, response_cache, await storage.get_data_version(), build,
+                                          PaginatedResponse, exclude_unset=True)
+
+
+    @router.post("/songs/bulk", response_model=BulkImportResponse)
+    async def bulk_import(request: Request):
+        """批量导入歌曲（NDJSON或JSON数组），返回逐行错误"""
+        return await bulk_import_songs(request, storage.create_songs_bulk)
+
+
+    @router.get("/songs/export")
+    async def export_songs():
+        """以NDJSON流式导出全部歌曲"""
+        return StreamingResponse(export_songs_ndjson(storage.iter_song_batches()), media_type="application/x-ndjson")
+
+
+    @router.get("/songs/changes", response_model=ChangeFeedResponse, response_model_exclude_unset=True)
+    async def get_song_changes(
+        request: Request,
+        since: int = Query(0, ge=0, description="上次同步返回的next_since，0表示从头开始"),
+        limit: int = Query(100, ge=1, le=1000)
+    ):
+        """增量同步：返回变更序号大于since的新建、修改的歌曲和删除墓碑，按序号升序"""
+        async def build():
+            changes, next_since, has_more = await storage.get_changes(since, limit)
+            return {"changes": changes, "next_since": next_since, "has_more": has_more}
+
+        return await cached_json_response(request, response_cache, await storage.get_data_version(), build,
+                                          ChangeFeedResponse, exclude_unset=True)
+
+
+    @router.get("/songs/{song_id}", response_model=SongResponse)
+    async def get_song_detail(song_id: int = Path(..., ge=1, description="歌曲ID")):
+        """根据ID获取歌曲详情"""
+        song = await storage.get_song_by_id(song_id)
+        if song is None:
+            raise HTTPException(status_code=404, detail="歌曲不存在")
+        else:
+            return FastJSONResponse(validated_json(SongResponse, song))
+
+
+    @router.post("/songs", response_model=SongResponse, status_code=201)
+    async def create_song(song: SongCreate):
+        """创建新歌曲"""
+        res = await storage.create_song(dict(song))
+        if res == {}:
+            raise HTTPException(status_code=400, detail="请求参数错误")
+        return FastJSONResponse(validated_json(SongResponse, res), status_code=201)
+
+
+    @router.patch("/songs", response_model=List[SongResponse])
+    async def update_songs(updates: List[SongBatchUpdate]):
+        """批量更新歌曲，任一项失败则全部不生效"""
+        songs, errors = await storage.update_songs_batch([dict(update) for update in updates])
+        if errors:
+            raise HTTPException(status_code=404, detail=[{"index": index, "error": error} for index, error in errors])
+        return FastJSONResponse(validated_json(List[SongResponse], songs))
+
+
+    @router.put("/songs/{song_id}", response_model=SongResponse)
+    async def update_song(song_id: int = Path(..., ge=1, description="歌曲ID"), song: SongUpdate = None):
+        """更新歌曲信息"""
+        res = await storage.update_song(song_id, dict(song))
+        if res is not None:
+            return FastJSONResponse(validated_json(SongResponse, res))
+        raise HTTPException(status_code=404, detail="歌曲不存在")
+
+
+    @router.delete("/songs/{song_id}", status_code=204)
+    async def delete_song(song_id: int = Path(..., ge=1, description="歌曲ID")):
+        """删除歌曲"""
+        if not await storage.delete_song(song_id):
+            raise HTTPException(status_code=404, detail="歌曲不存在")
+
+    return router
@@ -0,0 +1,141 @@
+import asyncio
+import time
+from collections import deque
+from typing import Deque, List, Optional
+
+from config import ADMISSION_LIMITS, ADMISSION_QUEUE_TIMEOUT_MS, ADMISSION_RETRY_AFTER
+from services.json_response import FastJSONResponse
+from services.metrics import REGISTRY, CallbackGauge, Counter, Histogram
+
+ADMISSION_REJECTED = REGISTRY.register(Counter(
+    "admission_rejected_total", "准入控制直接返回503的请求数", ("route", "reason")))
+ADMISSION_WAIT = REGISTRY.register(Histogram(
+    "admission_wait_seconds", "请求在准入队列中等待的耗时（只统计最终放行的请求）", ("route",)))
+
+
+class RouteLimiter:
+    """单个路由前缀的并发限制：最多max_concurrent个请求同时处理，其余最多max_queue个排队等待
+
+    空出的名额按先来先到直接交给队首的请求；等待超过timeout秒或队列已满的请求被拒绝。
+    只在事件循环线程中使用，不需要加锁。
+    """
+
+    def __init__(self, prefix: str, max_concurrent: int, max_queue: int, timeout: float):
+        self.prefix = prefix
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> Optional[str]:
+        """取得处理名额，成功返回None，被拒绝时返回原因（queue_full或timeout）"""
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            return None
+        if len(self._waiters) >= self.max_queue:
+            return "queue_full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        start = time.perf_counter()
+        try:
+            # asyncio.wait超时不会取消waiter，可以区分“超时”和“超时的同时刚好拿到名额”
+            await asyncio.wait((waiter,), timeout=self.timeout)
+        except asyncio.CancelledError:
+            # 客户端断开：已经交过来的名额要还回去
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                self._discard(waiter)
+            raise
+        if not waiter.done():
+            self._discard(waiter)
+            return "timeout"
+        ADMISSION_WAIT.observe(time.perf_counter() - start, self.prefix)
+        return None
+
+    def release(self):
+        """归还名额：有排队的请求时直接转交给队首，active不变"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def _discard(self, waiter: asyncio.Future):
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+
+def parse_limits(spec: str, timeout: float) -> List[RouteLimiter]:
+    """解析“前缀=并发数:队列长度”的逗号分隔列表，按前缀从长到短排列以便最长匹配"""
+    limiters = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        prefix, _, limits = item.partition("=")
+        concurrent, _, queue = limits.partition(":")
+        try:
+            limiter = RouteLimiter(prefix.strip(), int(concurrent), int(queue or 0), timeout)
+        except ValueError:
+            raise ValueError("无效的ADMISSION_LIMITS配置: " + item)
+        if limiter.max_concurrent < 1 or limiter.max_queue < 0:
+            raise ValueError("无效的ADMISSION_LIMITS配置: " + item)
+        limiters.append(limiter)
+    return sorted(limiters, key=lambda limiter: len(limiter.prefix), reverse=True)
+
+
+class AdmissionMiddleware:
+    """纯ASGI中间件：按路径前缀限制同时处理的请求数，超出排队上限或等待超时时快速返回503
+
+    存储变慢时（SQLite被锁、JSON文件变大）请求不会在线程池里无限堆积，
+    已放行的请求保持稳定的吞吐和延迟；未配置的路径（/health、/metrics）不受限制。
+    """
+
+    def __init__(self, app, limits: str = ADMISSION_LIMITS,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT_MS / 1000,
+                 retry_after: int = ADMISSION_RETRY_AFTER):
+        self.app = app
+        self.limiters = parse_limits(limits, queue_timeout)
+        self.retry_after = retry_after
+        REGISTRY.register(CallbackGauge(
+            "admission_in_flight", "准入控制放行、正在处理的请求数", ("route",),
+            lambda: [((limiter.prefix,), limiter.active) for limiter in self.limiters]))
+        REGISTRY.register(CallbackGauge(
+            "admission_queue_depth", "在准入队列中等待的请求数", ("route",),
+            lambda: [((limiter.prefix,), limiter.queued) for limiter in self.limiters]))
+
+    def _match(self, path: str) -> Optional[RouteLimiter]:
+        for limiter in self.limiters:
+            if path == limiter.prefix or path.startswith(limiter.prefix.rstrip("/") + "/"):
+                return limiter
+        return None
+
+    async def __call__(self, scope, receive, send):
+        limiter = self._match(scope["path"]) if scope["type"] == "http" else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        reason = await limiter.acquire()
+        if reason is not None:
+            ADMISSION_REJECTED.inc(limiter.prefix, reason)
+            response = FastJSONResponse(status_code=503, content={"detail": "服务繁忙，请稍后重试"},
+                                        headers={"Retry-After": str(self.retry_after)})
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
@@ -0,0 +1,255 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple, Dict, Any, AsyncIterator, Sequence
+
+from config import DB_IO_WORKERS, FILE_IO_WORKERS, BULK_BATCH_SIZE
+from services.db_manager import DatabaseManager
+from services.file_manager import FileManager
+from services.memory_manager import MemoryManager
+from services.metrics import operation_metrics
+from services.profiling import current_profile, timed
+
+
+class AsyncStorage:
+    """在专用I/O线程池中执行同步存储调用，对外提供可await的接口"""
+
+    def __init__(self, manager, max_workers: int, thread_name_prefix: str):
+        self.manager = manager
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=thread_name_prefix
+        )
+
+    async def _run(self, func, *args, **kwargs):
+        """在I/O线程中执行func，并把当前请求的contextvars带过去；等待的时间计入Server-Timing的storage"""
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()
+        profile = current_profile()
+        if profile is not None:
+            # 正在分析的请求，存储调用在I/O线程中也要分析
+            call = functools.partial(ctx.run, profile.run_in_thread, func, *args, **kwargs)
+        else:
+            call = functools.partial(ctx.run, func, *args, **kwargs)
+        with timed("storage"):
+            return await loop.run_in_executor(self._executor, call)
+
+    async def _iterate(self, iterator) -> AsyncIterator:
+        """在I/O线程中逐个推进同步迭代器，提前结束时在I/O线程中关闭它"""
+        try:
+            while True:
+                item = await self._run(next, iterator, None)
+                if item is None:
+                    break
+                yield item
+        finally:
+            await self._run(iterator.close)
+
+    async def startup(self):
+        """在I/O线程中初始化存储（建表/迁移、准备数据文件），由应用的lifespan调用"""
+        await self._run(self.manager.initialize)
+
+    def shutdown(self, wait: bool = True):
+        """关闭I/O线程池"""
+        self._executor.shutdown(wait=wait)
+
+
+class AsyncDatabaseManager(AsyncStorage):
+    """DatabaseManager的异步版本"""
+
+    def __init__(self, manager: Optional[DatabaseManager] = None, max_workers: int = DB_IO_WORKERS):
+        super().__init__(manager or DatabaseManager(), max_workers, "db-io")
+
+    async def get_all_bands(self, with_stats: bool = False) -> List[Dict[str, Any]]:
+        return await self._run(self.manager.get_all_bands, with_stats)
+
+    async def get_band_by_name(self, name: str, with_stats: bool = False) -> Optional[Dict[str, Any]]:
+        return await self._run(self.manager.get_band_by_name, name, with_stats)
+
+    async def get_songs(
+        self,
+        band: Optional[str] = None,
+        title: Optional[str] = None,
+        page_index: int = 1,
+        page_size: int = 10,
+        after_id: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+        author: Optional[str] = None,
+        title_prefix: Optional[str] = None,
+        sort: str = "id",
+        descending: bool = False
+    ) -> Tuple[List[Dict[str, Any]], int, Optional[int]]:
+        return await self._run(self.manager.get_songs, band, title, page_index, page_size, after_id, fields,
+                               author, title_prefix, sort, descending)
+
+    async def search_songs(
+        self,
+        q: str,
+        page_index: int = 1,
+        page_size: int = 10,
+        fields: Optional[Sequence[str]] = None
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        return await self._run(self.manager.search_songs, q, page_index, page_size, fields)
+
+    async def get_song_by_id(self, song_id: int) -> Optional[Dict[str, Any]]:
+        return await self._run(self.manager.get_song_by_id, song_id)
+
+    async def get_changes(self, since: int = 0, limit: int = 100) -> Tuple[List[Dict[str, Any]], int, bool]:
+        return await self._run(self.manager.get_changes, since, limit)
+
+    async def _write(self, method, operation, *args):
+        """单条写操作；启用写队列时直接等待写线程的Future，不占用I/O线程
+
+        method是DatabaseManager上带@instrumented的同步方法，排队写入不经过它，
+        在这里按同样的backend和operation标签记录从提交到事务提交完成的耗时、行数和异常数。
+        """
+        if self.manager.write_queue is None:
+            return await self._run(method, *args)
+        backend_label = getattr(self.manager, "metrics_backend", "db")
+        with timed("storage"), operation_metrics(backend_label, method.__name__) as record:
+            result = await asyncio.wrap_future(self.manager.submit_write(functools.partial(operation, *args)))
+            record(result)
+        return result
+
+    async def create_song(self, song_data: dict) -> Dict[str, Any]:
+        return await self._write(self.manager.create_song, self.manager.insert_song_op, song_data)
+
+    async def create_songs_bulk(self, songs: List[dict]) -> Tuple[int, List[Tuple[int, str]]]:
+        return await self._run(self.manager.create_songs_bulk, songs)
+
+    def iter_song_batches(self, batch_size: int = BULK_BATCH_SIZE) -> AsyncIterator[List[Dict[str, Any]]]:
+        return self._iterate(self.manager.iter_song_batches(batch_size))
+
+    async def update_song(self, song_id: int, song_data: dict) -> Optional[Dict[str, Any]]:
+        return await self._write(self.manager.update_song, self.manager.update_song_op, song_id, song_data)
+
+    async def update_songs_batch(self, updates: List[dict]) -> Tuple[List[Dict[str, Any]], List[Tuple[int, str]]]:
+        return await self._run(self.manager.update_songs_batch, updates)
+
+    async def delete_song(self, song_id: int) -> bool:
+        return await self._write(self.manager.delete_song, self.manager.delete_song_op, song_id)
+
+    async def get_data_version(self) -> int:
+        return await self._run(self.manager.get_data_version)
+
+    async def get_pool_stats(self) -> Dict[str, Any]:
+        # 只读取内存中的计数器，不需要切换线程
+        return self.manager.get_pool_stats()
+
+    def shutdown(self, wait: bool = True):
+        super().shutdown(wait)
+        self.manager.close()
+
+
+class AsyncFileManager(AsyncStorage):
+    """FileManager的异步版本"""
+
+    def __init__(self, manager: Optional[FileManager] = None, max_workers: int = FILE_IO_WORKERS):
+        super().__init__(manager or FileManager(), max_workers, "file-io")
+
+    async def get_all_bands(self, with_stats: bool = False) -> List[Dict]:
+        return await self._run(self.manager.get_all_bands, with_stats)
+
+    async def get_band_by_name(self, name: str, with_stats: bool = False) -> Optional[Dict]:
+        return await self._run(self.manager.get_band_by_name, name, with_stats)
+
+    async def get_data_version(self) -> int:
+        return await self._run(self.manager.get_data_version)
+
+    async def get_all_songs(self) -> List[Dict]:
+        return await self._run(self.manager.get_all_songs)
+
+    async def get_song_by_id(self, song_id: int) -> Optional[Dict]:
+        return await self._run(self.manager.get_song_by_id, song_id)
+
+    async def get_changes(self, since: int = 0, limit: int = 100) -> Tuple[List[Dict], int, bool]:
+        return await self._run(self.manager.get_changes, since, limit)
+
+    async def get_songs_by_band(self, band_name: str) -> List[Dict]:
+        return await self._run(self.manager.get_songs_by_band, band_name)
+
+    async def search_songs_by_title(
+        self,
+        title: str,
+        limit: Optional[int] = 5,
+        score_cutoff: int = 0,
+        include_author: bool = False
+    ) -> List[Dict]:
+        return await self._run(self.manager.search_songs_by_title, title, limit, score_cutoff, include_author)
+
+    async def query_songs(
+        self,
+        band: Optional[str] = None,
+        title: Optional[str] = None,
+        author: Optional[str] = None,
+        title_prefix: Optional[str] = None,
+        sort: Optional[str] = None,
+        descending: bool = False,
+        score_cutoff: int = 0
+    ) -> List[Dict]:
+        return await self._run(self.manager.query_songs, band, title, author, title_prefix, sort, descending,
+                               score_cutoff)
+
+    async def create_song(self, song_data: Dict) -> Dict:
+        return await self._run(self.manager.create_song, song_data)
+
+    async def create_songs_bulk(self, songs: List[Dict]) -> Tuple[int, List[Tuple[int, str]]]:
+        return await self._run(self.manager.create_songs_bulk, songs)
+
+    def iter_song_batches(self, batch_size: int = BULK_BATCH_SIZE) -> AsyncIterator[List[Dict]]:
+        return self._iterate(self.manager.iter_song_batches(batch_size))
+
+    async def update_song(self, song_id: int, song_data: Dict) -> Optional[Dict]:
+        return await self._run(self.manager.update_song, song_id, song_data)
+
+    async def update_songs_batch(self, updates: List[Dict]) -> Tuple[List[Dict], List[Tuple[int, str]]]:
+        return await self._run(self.manager.update_songs_batch, updates)
+
+    async def delete_song(self, song_id: int) -> bool:
+        return await self._run(self.manager.delete_song, song_id)
+
+
+class AsyncMemoryManager(AsyncFileManager):
+    """MemoryManager的异步版本
+
+    只读取单个对象或一页记录的调用直接在事件循环中执行，省去线程切换。写入要取得数据目录的flock，
+    其他进程持有锁或磁盘变慢时会阻塞；列表、模糊搜索、批量导入导出的开销与歌曲数成正比，
+    这些调用都和文件存储一样放到I/O线程中执行。
+    """
+
+    def __init__(self, manager: Optional[MemoryManager] = None, max_workers: int = FILE_IO_WORKERS):
+        AsyncStorage.__init__(self, manager or MemoryManager(), max_workers, "memory-io")
+
+    async def _run_inline(self, func, *args, **kwargs):
+        """在事件循环中直接执行只涉及内存字典的小操作
+
+        写入在等待flock时一直持有manager的锁（可重入），锁被占用时改到I/O线程中等待，事件循环从不阻塞在锁上。
+        """
+        if not self.manager._lock.acquire(blocking=False):
+            return await self._run(func, *args, **kwargs)
+        try:
+            with timed("storage"):
+                return func(*args, **kwargs)
+        finally:
+            self.manager._lock.release()
+
+    async def get_all_bands(self, with_stats: bool = False) -> List[Dict]:
+        return await self._run_inline(self.manager.get_all_bands, with_stats)
+
+    async def get_band_by_name(self, name: str, with_stats: bool = False) -> Optional[Dict]:
+        return await self._run_inline(self.manager.get_band_by_name, name, with_stats)
+
+    async def get_data_version(self) -> int:
+        return await self._run_inline(self.manager.get_data_version)
+
+    async def get_song_by_id(self, song_id: int) -> Optional[Dict]:
+        return await self._run_inline(self.manager.get_song_by_id, song_id)
+
+    async def get_changes(self, since: int = 0, limit: int = 100) -> Tuple[List[Dict], int, bool]:
+        return await self._run_inline(self.manager.get_changes, since, limit)
+
+    def shutdown(self, wait: bool = True):
+        super().shutdown(wait)
+        # 退出前写入最后一次快照
+        self.manager.close()
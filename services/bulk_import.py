@@ -0,0 +1,98 @@
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+
+from config import BULK_BATCH_SIZE
+from models.bangdream_models import SongCreate, BulkError, BulkImportResponse
+
+
+async def iter_bulk_rows(request: Request) -> AsyncIterator[Tuple[int, Any, Optional[str]]]:
+    """解析批量导入的请求体，逐行返回 (行号, 解析出的对象, 错误信息)
+
+    Content-Type为application/x-ndjson时边接收边按行解析，否则按JSON数组解析。
+    """
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        index = 0
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield (index,) + _parse_line(line)
+                    index += 1
+        if buffer.strip():
+            yield (index,) + _parse_line(buffer)
+    else:
+        try:
+            data = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="请求体不是合法的JSON")
+        if not isinstance(data, list):
+            raise HTTPException(status_code=400, detail="请求体必须是JSON数组或NDJSON")
+        for index, item in enumerate(data):
+            yield index, item, None
+
+
+def _parse_line(line: bytes) -> Tuple[Any, Optional[str]]:
+    """解析NDJSON中的一行"""
+    try:
+        return json.loads(line), None
+    except ValueError as e:
+        return None, "JSON解析失败: " + str(e)
+
+
+def _format_validation_error(e: ValidationError) -> str:
+    """把pydantic的校验错误压缩成一行"""
+    return "; ".join(
+        ".".join(str(loc) for loc in err["loc"]) + ": " + err["msg"] for err in e.errors()
+    )
+
+
+async def bulk_import_songs(
+    request: Request,
+    create_songs_bulk: Callable[[List[Dict]], Awaitable[Tuple[int, List[Tuple[int, str]]]]],
+    batch_size: int = BULK_BATCH_SIZE
+) -> BulkImportResponse:
+    """按批校验并写入歌曲，每批调用一次存储层的批量创建，汇总逐行错误"""
+    inserted = 0
+    errors: List[BulkError] = []
+    batch: List[Dict] = []
+    batch_indexes: List[int] = []
+
+    async def flush():
+        nonlocal inserted
+        count, row_errors = await create_songs_bulk(batch)
+        inserted += count
+        for position, message in row_errors:
+            errors.append(BulkError(index=batch_indexes[position], error=message))
+        batch.clear()
+        batch_indexes.clear()
+
+    async for index, item, error in iter_bulk_rows(request):
+        if error is not None:
+            errors.append(BulkError(index=index, error=error))
+            continue
+        try:
+            song = SongCreate.model_validate(item)
+        except ValidationError as e:
+            errors.append(BulkError(index=index, error=_format_validation_error(e)))
+            continue
+        batch.append(song.model_dump())
+        batch_indexes.append(index)
+        if len(batch) >= batch_size:
+            await flush()
+    if batch:
+        await flush()
+
+    errors.sort(key=lambda err: err.index)
+    return BulkImportResponse(inserted=inserted, failed=len(errors), errors=errors)
+
+
+async def export_songs_ndjson(batches: AsyncIterator[List[Dict]]) -> AsyncIterator[bytes]:
+    """把分批读取的歌曲逐批编码为NDJSON"""
+    async for batch in batches:
+        yield "".join(json.dumps(song, ensure_ascii=False) + "\n" for song in batch).encode("utf-8")
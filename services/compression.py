@@ -0,0 +1,155 @@
+import gzip
+from typing import List, Optional
+
+from config import (
+    COMPRESSION_MIN_BYTES, COMPRESSION_GZIP_LEVEL, COMPRESSION_BROTLI_QUALITY,
+    COMPRESSION_CACHE_MAX_ENTRIES, COMPRESSION_CACHE_MAX_BYTES
+)
+from services.metrics import REGISTRY, Counter, register_stats_gauge
+from services.response_cache import ResponseCache
+
+try:
+    import brotli
+except ImportError:  # brotli是可选依赖，没有时只提供gzip
+    brotli = None
+
+# 服务端的优先顺序：同等q值下brotli压缩率更高
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+COMPRESSION_BYTES = REGISTRY.register(Counter(
+    "http_compression_bytes_total", "压缩前后的响应体字节数", ("encoding", "stage")))
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """按Accept-Encoding的q值选择编码，q相同时按SUPPORTED_ENCODINGS的顺序；都不接受时返回None"""
+    weights = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name.strip()] = q
+    best, best_q = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+    # mtime固定为0，相同内容的压缩结果逐字节相同
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    """纯ASGI中间件：按Accept-Encoding用brotli或gzip压缩超过阈值的JSON/文本响应
+
+    带ETag的响应（缓存的读接口）在两次写入之间内容不变，压缩结果按(ETag, 编码)缓存，
+    同一响应体不会被反复压缩。ETag按未压缩的内容计算，客户端接受压缩时改为弱ETag。
+    流式响应（如导出）和已经设置Content-Encoding的响应原样透传。
+    """
+
+    def __init__(self, app, min_bytes: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.min_bytes = min_bytes
+        self.cache = ResponseCache(COMPRESSION_CACHE_MAX_ENTRIES, COMPRESSION_CACHE_MAX_BYTES)
+        register_stats_gauge("compression_cache_stats", "压缩结果缓存统计", self.cache.stats,
+                             ("entries", "bytes", "hits", "misses"))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = b""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value
+                break
+        encoding = choose_encoding(accept_encoding.decode("latin-1")) if accept_encoding else None
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", [])
+                if encoding is not None:
+                    # 客户端接受压缩时ETag一律改为弱ETag，200和304返回的ETag保持一致
+                    headers = message["headers"] = [
+                        (name, b"W/" + value if name == b"etag" and not value.startswith(b"W/") else value)
+                        for name, value in headers]
+                content_type = b""
+                for name, value in headers:
+                    if name == b"content-encoding":
+                        passthrough = True
+                    elif name == b"content-type":
+                        content_type = value
+                if passthrough or not content_type.decode("latin-1").startswith(COMPRESSIBLE_TYPES):
+                    passthrough = True
+                    await send(message)
+                    return
+                # 可压缩的类型无论本次是否压缩，都要告诉中间缓存按Accept-Encoding区分
+                message["headers"] = [(name, value) for name, value in headers if name != b"vary"] + \
+                    [(b"vary", self._vary(headers))]
+                start_message = message
+                return
+
+            body = message.get("body", b"")
+            if message.get("more_body", False) or encoding is None or len(body) < self.min_bytes:
+                # 流式响应、客户端不接受压缩或响应体太小时原样发送
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            headers = start_message["headers"]
+            etag = None
+            for name, value in headers:
+                if name == b"etag":
+                    etag = value.decode("latin-1")
+            compressed = self._compressed(body, encoding, etag)
+            rewritten = [(name, value) for name, value in headers if name != b"content-length"]
+            rewritten.append((b"content-encoding", encoding.encode("latin-1")))
+            rewritten.append((b"content-length", str(len(compressed)).encode("latin-1")))
+            start_message["headers"] = rewritten
+            passthrough = True
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def _vary(headers: List) -> bytes:
+        for name, value in headers:
+            if name == b"vary":
+                if b"accept-encoding" in value.lower():
+                    return value
+                return value + b", Accept-Encoding"
+        return b"Accept-Encoding"
+
+    def _compressed(self, body: bytes, encoding: str, etag: Optional[str]) -> bytes:
+        """压缩响应体；有ETag时先查缓存"""
+        key = (etag, encoding)
+        if etag is not None:
+            entry = self.cache.get(key)
+            if entry is not None:
+                return entry[0]
+        compressed = compress(body, encoding)
+        COMPRESSION_BYTES.inc(encoding, "in", amount=len(body))
+        COMPRESSION_BYTES.inc(encoding, "out", amount=len(compressed))
+        if etag is not None:
+            self.cache.put(key, compressed)
+        return compressed
@@ -1,82 +1,161 @@
 import sqlite3
 import os
-from typing import List, Optional, Tuple, Dict, Any, clear_overloads, final
+import re
+from concurrent.futures import Future
+from contextlib import contextmanager
+from functools import partial
+from typing import List, Optional, Tuple, Dict, Any, Iterator, Sequence
 from datetime import datetime
 
+from config import (
+    DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_BUSY_TIMEOUT_MS, DB_CACHED_STATEMENTS, BULK_BATCH_SIZE, DB_WRITE_QUEUE
+)
+from services.db_pool import ConnectionPool
+from services.write_queue import WriteQueue, WriteOperation
+from services.migrations import migrate
+from services.metrics import instrumented
+from services.lyrics_codec import compress_lyrics, LYRICS_PLAIN
+from services.fts_text import segment_cjk, unsegment_cjk
+
+# songs_with_band视图中允许被投影查询的列
+SONG_COLUMNS = ("id", "title", "author", "lyrics", "band", "created_at", "updated_at")
+# 歌曲列表支持的排序字段
+SONG_SORT_COLUMNS = ("id", "title", "created_at", "updated_at")
+# 允许通过更新接口修改的列
+UPDATABLE_SONG_COLUMNS = ("title", "author", "lyrics", "band")
+# 写入语句RETURNING的列：把band_id换回乐队名，与songs_with_band视图的行一致
+SONG_RETURNING = (
+    "RETURNING id, title, author, lyrics_text(lyrics, lyrics_codec) AS lyrics, (SELECT name FROM bands WHERE bands.id = songs.band_id) AS band, "
+    "created_at, updated_at"
+)
+# 按乐队名取band_id；乐队不存在时为NULL，违反NOT NULL约束
+BAND_ID_BY_NAME = "(SELECT id FROM bands WHERE name = ?)"
+
+
+def _prefix_upper_bound(prefix: str) -> Optional[str]:
+    """以prefix开头的字符串的上界（不含）：末字符加一，跳过代理区（单独的代理字符无法编码为UTF-8）；
+    末字符已是U+10FFFF时去掉它、改为前一个字符加一，全部是U+10FFFF时没有上界，返回None"""
+    prefix = prefix.rstrip("\U0010ffff")
+    if not prefix:
+        return None
+    code = ord(prefix[-1]) + 1
+    if 0xD800 <= code <= 0xDFFF:
+        code = 0xE000
+    return prefix[:-1] + chr(code)
+
 
 class DatabaseManager:
-    def __init__(self, db_path: str = "data/band.db"):
+    def __init__(
+        self,
+        db_path: str = "data/band.db",
+        pool_size: int = DB_POOL_SIZE,
+        pool_timeout: float = DB_POOL_TIMEOUT,
+        write_queue: bool = DB_WRITE_QUEUE
+    ):
         self.db_path = db_path
-        self.init_database()
+        # 连接按需创建；目录和表结构在initialize()中准备，不在构造时做任何I/O
+        self.pool = ConnectionPool(
+            db_path,
+            pool_size=pool_size,
+            timeout=pool_timeout,
+            busy_timeout_ms=DB_BUSY_TIMEOUT_MS,
+            cached_statements=DB_CACHED_STATEMENTS
+        )
+        # 可选的组提交写队列，单条写操作经由它合并提交
+        self.write_queue = WriteQueue(self.pool) if write_queue else None
 
+    @contextmanager
     def get_connection(self):
-        """获取数据库连接"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # 使查询结果可以像字典一样访问
-        return conn
-
-    def init_database(self):
-        """初始化数据库表结构"""
-        # 确保数据目录存在
-        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        """从连接池借出数据库连接，with块结束后自动归还"""
+        with self.pool.connection() as conn:
+            yield conn
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """获取连接池统计信息"""
+        return self.pool.stats()
+
+    def close(self):
+        """停止写队列并关闭连接池中的所有连接"""
+        if self.write_queue is not None:
+            self.write_queue.close()
+        self.pool.close()
+
+    def get_data_version(self) -> int:
+        """数据版本号，用于响应缓存和ETag，从数据库本身读取
+
+        由触发器维护的变更序号（歌曲的增删改）加上乐队的自增序列，两者都只增不减，任何一方变化时和也随之变化。
+        其他进程（另一个worker、manage.py）的写入同样可见，不依赖本进程是否经手。
+        """
+        with self.get_connection() as conn:
+            return conn.execute(
+                "SELECT (SELECT seq FROM change_counter WHERE id = 1)"
+                " + COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'bands'), 0)"
+            ).fetchone()[0]
 
-        conn = self.get_connection()
+    def submit_write(self, operation: WriteOperation) -> Future:
+        """提交一个单条写操作，返回在事务提交后完成的Future
+
+        启用写队列时交给写线程组提交；否则在当前线程单独执行并提交一个事务。
+        """
+        if self.write_queue is not None:
+            return self.write_queue.submit(operation)
+        future = Future()
         try:
-            cursor = conn.cursor()
+            with self.get_connection() as conn:
+                result = operation(conn)
+                conn.commit()
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        return future
 
-            # 创建乐队表
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS bands (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT UNIQUE NOT NULL,
-                    description TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
+    def initialize(self):
+        """确保数据目录存在并把数据库迁移到最新版本；由应用启动流程（lifespan）或管理命令调用"""
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.init_database()
 
-            # 创建歌曲表
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS songs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT NOT NULL,
-                    author TEXT,
-                    lyrics TEXT,
-                    band TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-
-            # 插入初始乐队数据
-            initial_bands = [
-                ("MyGO!!!!!", "迷失自我，但却向前。她们以充满情感的摇滚乐，表达年轻人的迷茫与坚定。"),
-                ("Ave Mujica", "虚伪的假面，真实的自我。这是一个神秘且充满戏剧性的交响乐团，每个成员都带着面具。"),
-                ("Morfonica", "如梦似幻的交响乐团。她们以小提琴为主轴，演奏出优雅而华丽的乐章。")
-            ]
-
-            cursor.executemany(
-                "INSERT OR IGNORE INTO bands (name, description) VALUES (?, ?)",
-                initial_bands
-            )
-            # 检查歌曲表是否为空
-            cursor.execute("SELECT COUNT(*) as count FROM songs")
-            song_count = cursor.fetchone()["count"]
-
-            if song_count == 0:
-                # 插入一些示例歌曲数据
-                initial_songs = [
-                    ("黑色生日", "Doloris", "歌词内容...", "Ave Mujica"),
-                    ("迷星叫", "MyGO!!!!!", "歌词内容...", "MyGO!!!!!")
-                ]
+    def init_database(self) -> List[Tuple[int, str]]:
+        """执行待执行的结构迁移，已是最新版本时只查询一次schema_version"""
+        with self.get_connection() as conn:
+            applied = migrate(conn)
+        for number, name in applied:
+            print("数据库迁移 %d_%s 已完成" % (number, name))
+        return applied
 
-                cursor.executemany(
-                    "INSERT OR IGNORE INTO songs (title, author, lyrics, band) VALUES (?, ?, ?, ?)",
-                    initial_songs
-                )
+    def seed(self) -> Tuple[int, int]:
+        """写入示例乐队和歌曲，只通过管理命令调用；乐队已存在时跳过，歌曲表非空时不插入示例歌曲
 
+        返回 (新增乐队数, 新增歌曲数)。
+        """
+        initial_bands = [
+            ("MyGO!!!!!", "迷失自我，但却向前。她们以充满情感的摇滚乐，表达年轻人的迷茫与坚定。"),
+            ("Ave Mujica", "虚伪的假面，真实的自我。这是一个神秘且充满戏剧性的交响乐团，每个成员都带着面具。"),
+            ("Morfonica", "如梦似幻的交响乐团。她们以小提琴为主轴，演奏出优雅而华丽的乐章。")
+        ]
+        initial_songs = [
+            ("黑色生日", "Doloris", "歌词内容...", "Ave Mujica"),
+            ("迷星叫", "MyGO!!!!!", "歌词内容...", "MyGO!!!!!")
+        ]
+        # 与接口写入的行一样使用本地时间的ISO 8601格式，不依赖列默认值（CURRENT_TIMESTAMP是UTC、以空格分隔）
+        now = datetime.now().isoformat()
+        with self.get_connection() as conn:
+            bands = conn.execute("SELECT COUNT(*) FROM bands").fetchone()[0]
+            conn.executemany(
+                "INSERT OR IGNORE INTO bands (name, description, created_at) VALUES (?, ?, ?)",
+                [band + (now,) for band in initial_bands]
+            )
+            bands = conn.execute("SELECT COUNT(*) FROM bands").fetchone()[0] - bands
+            songs = 0
+            if conn.execute("SELECT 1 FROM songs LIMIT 1").fetchone() is None:
+                conn.executemany(
+                    "INSERT INTO songs (title, author, lyrics, band_id, created_at, updated_at) "
+                    "VALUES (?, ?, ?, " + BAND_ID_BY_NAME + ", ?, ?)",
+                    [song + (now, now) for song in initial_songs]
+                )
+                songs = len(initial_songs)
             conn.commit()
-        finally:
-            conn.close()
+        return bands, songs
 
     def row_to_dict(self, row) -> Dict[str, Any]:
         """将sqlite3.Row转换为字典"""
@@ -85,137 +164,427 @@ class DatabaseManager:
         return dict(row)
 
     # 乐队相关操作
-    def get_all_bands(self) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _band_select(with_stats: bool) -> str:
+        """乐队查询的SELECT部分，with_stats时从band_stats汇总表带出歌曲数和最近更新时间"""
+        if not with_stats:
+            return "SELECT * FROM bands"
+        return (
+            "SELECT bands.*, COALESCE(band_stats.song_count, 0) AS song_count, band_stats.last_updated "
+            "FROM bands LEFT JOIN band_stats ON band_stats.band_id = bands.id"
+        )
+
+    @instrumented("db")
+    def get_all_bands(self, with_stats: bool = False) -> List[Dict[str, Any]]:
         """获取所有乐队"""
-        conn = self.get_connection()
-        try:
+        with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM bands ORDER BY name")
+            cursor.execute(self._band_select(with_stats) + " ORDER BY name")
             rows = cursor.fetchall()
             return [self.row_to_dict(row) for row in rows]
-        finally:
-            conn.close()
 
-    def get_band_by_name(self, name: str) -> Optional[Dict[str, Any]]:
+    @instrumented("db")
+    def get_band_by_name(self, name: str, with_stats: bool = False) -> Optional[Dict[str, Any]]:
         """根据名称获取乐队"""
-        conn = self.get_connection()
-        try:
+        with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM bands WHERE name = '"+(name)+"'")
+            cursor.execute(self._band_select(with_stats) + " WHERE name = ?", (name,))
             row = cursor.fetchone()
             if row is not None:
                 return self.row_to_dict(row)
             else:
                 return None
-        finally:
-            conn.close()
 
-            # 歌曲相关操作
+    # 歌曲相关操作
+    @staticmethod
+    def _song_filters(
+        band: Optional[str] = None,
+        title: Optional[str] = None,
+        author: Optional[str] = None,
+        title_prefix: Optional[str] = None
+    ) -> Tuple[List[str], List[Any]]:
+        """把过滤条件转换为songs_with_band视图上的WHERE子句，各条件之间为AND"""
+        where = []
+        params = []
+        if band is not None:
+            where.append("band = ?")
+            params.append(band)
+        if author is not None:
+            where.append("author = ?")
+            params.append(author)
+        if title is not None:
+            where.append("title = ?")
+            params.append(title)
+        if title_prefix:
+            # 前缀写成范围条件才能用上title开头的索引（LIKE默认不区分大小写，用不上普通索引）
+            where.append("title >= ?")
+            params.append(title_prefix)
+            upper = _prefix_upper_bound(title_prefix)
+            if upper is not None:
+                where.append("title < ?")
+                params.append(upper)
+        return where, params
+
+    @staticmethod
+    def _song_order(sort: str = "id", descending: bool = False) -> str:
+        """ORDER BY子句；非ID排序以ID为第二排序键，翻页结果稳定"""
+        if sort not in SONG_SORT_COLUMNS:
+            raise ValueError("不支持的排序字段: " + sort)
+        direction = " DESC" if descending else ""
+        if sort == "id":
+            return " ORDER BY id" + direction
+        return " ORDER BY %s%s, id%s" % (sort, direction, direction)
+
+    def song_list_queries(
+        self,
+        band: Optional[str] = None,
+        title: Optional[str] = None,
+        author: Optional[str] = None,
+        title_prefix: Optional[str] = None,
+        sort: str = "id",
+        descending: bool = False,
+        fields: Optional[Sequence[str]] = None,
+        after_id: Optional[int] = None
+    ) -> List[Tuple[str, List[Any]]]:
+        """歌曲列表的 [(计数SQL, 参数), (分页SQL, 参数)]，分页SQL末尾还需追加LIMIT和OFFSET的参数
+
+        与get_songs使用同一套条件，管理命令用它检查各种组合的查询计划。
+        """
+        where, params = self._song_filters(band, title, author, title_prefix)
+        if title is None and author is None and not title_prefix:
+            # 只按乐队过滤或不过滤时，总数直接读汇总表，不扫描songs
+            count_sql = "SELECT COALESCE(SUM(song_count), 0) FROM band_stats"
+            count_params = []
+            if band is not None:
+                count_sql += " WHERE band_id = " + BAND_ID_BY_NAME
+                count_params.append(band)
+        else:
+            count_sql = "SELECT COUNT(*) FROM songs_with_band WHERE " + " AND ".join(where)
+            count_params = list(params)
+        if after_id is not None:
+            # 游标只影响当前页，不影响总数
+            where.append("id > ?")
+            params.append(after_id)
+        sql = "SELECT " + self._song_columns(fields) + " FROM songs_with_band"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += self._song_order(sort, descending) + " LIMIT ? OFFSET ?"
+        return [(count_sql, count_params), (sql, params)]
+
+    @instrumented("db")
     def get_songs(
         self,
         band: Optional[str] = None,
         title: Optional[str] = None,
         page_index: int = 1,
-        page_size: int = 10
+        page_size: int = 10,
+        after_id: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+        author: Optional[str] = None,
+        title_prefix: Optional[str] = None,
+        sort: str = "id",
+        descending: bool = False
+    ) -> Tuple[List[Dict[str, Any]], int, Optional[int]]:
+        """获取歌曲列表，乐队、作者、标题和标题前缀可以任意组合过滤，按sort字段升序或降序排列
+
+        after_id不为None时使用游标分页（WHERE id > after_id），只支持按ID升序；否则使用LIMIT/OFFSET。
+        fields指定只读取的列（id总会被读取），为None时读取全部列。
+        返回 (当前页歌曲, 总数, 下一页游标)，没有下一页或不是按ID升序时游标为None。
+        """
+        if after_id is not None and (sort != "id" or descending):
+            raise ValueError("游标分页只支持按ID升序")
+        (count_sql, count_params), (sql, params) = self.song_list_queries(
+            band, title, author, title_prefix, sort, descending, fields, after_id)
+        # 多取一行用于判断是否还有下一页
+        params = params + [page_size + 1, 0 if after_id is not None else (page_index - 1) * page_size]
+
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(count_sql, count_params)
+            total = cursor.fetchone()[0]
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+
+            next_cursor = None
+            if len(rows) > page_size:
+                rows = rows[:page_size]
+                if sort == "id" and not descending:
+                    next_cursor = rows[-1]["id"]
+            return [self.row_to_dict(row) for row in rows], total, next_cursor
+
+    @staticmethod
+    def _song_columns(fields: Optional[Sequence[str]], table: str = "songs_with_band") -> str:
+        """把字段列表转换为SQL列清单，只接受songs_with_band视图已有的列"""
+        if fields is None:
+            return table + ".*"
+        columns = ["id"] + [name for name in fields if name != "id"]
+        for name in columns:
+            if name not in SONG_COLUMNS:
+                raise ValueError("未知字段: " + name)
+        return ", ".join(table + "." + name for name in columns)
+
+    @staticmethod
+    def build_fts_query(q: str) -> Optional[str]:
+        """把用户输入转换为FTS5查询：引号内为短语，其余词按前缀匹配，词之间为AND
+
+        CJK文本与索引一样切分为单字，多字词成为相邻单字的短语，“日影”可以匹配“春日影”。
+        """
+        terms = []
+        for phrase, word in re.findall(r'"([^"]*)"|(\S+)', q):
+            if phrase.strip():
+                terms.append('"' + segment_cjk(phrase.strip()) + '"')
+            elif word:
+                word = word.replace('"', '')
+                if word:
+                    terms.append('"' + segment_cjk(word) + '"*')
+        if not terms:
+            return None
+        return " ".join(terms)
+
+    @instrumented("db")
+    def search_songs(
+        self,
+        q: str,
+        page_index: int = 1,
+        page_size: int = 10,
+        fields: Optional[Sequence[str]] = None
     ) -> Tuple[List[Dict[str, Any]], int]:
-        """获取歌曲列表（支持分页和过滤）"""
-        conn = self.get_connection()
-        try:
+        """全文检索标题和歌词，按bm25相关度排序并返回高亮片段
+
+        返回 (当前页歌曲, 命中总数)，每首歌额外包含score（越大越相关）和snippet字段。
+        """
+        match = self.build_fts_query(q)
+        if match is None:
+            return [], 0
+        with self.get_connection() as conn:
             cursor = conn.cursor()
-            if band is not None:
-                cursor.execute(
-                    "SELECT * FROM songs WHERE band = '" + band+"'")
-            elif title is not None:
-                cursor.execute(
-                    "SELECT * FROM songs WHERE title = '"+title+"'")
-            else:
-                cursor.execute("SELECT * FROM songs ORDER BY id")
-            data = cursor.fetchall()
-            res = []
-            for i in range((page_index-1)*page_size, min(len(data), (page_index)*page_size)):
-                res.append(data[i])
-            return [self.row_to_dict(row) for row in res], len(data)
-            # return [self.row_to_dict(row) for row in data], len(data)
-        except Exception as e:
-            conn.close()
-            raise e
-        finally:
-            conn.close()
-            # return ([], 0)
+            cursor.execute(
+                "SELECT COUNT(*) FROM songs_fts WHERE songs_fts MATCH ?", (match,))
+            total = cursor.fetchone()[0]
+            # 标题命中的权重高于歌词。排序会先算出所有命中行的结果列，子查询先选出当前页的rowid，
+            # 高亮片段（需要解压歌词）和歌曲列只对这一页计算
+            cursor.execute('''
+                SELECT %s,
+                       -bm25(songs_fts, 10.0, 1.0) AS score,
+                       snippet(songs_fts, -1, '<mark>', '</mark>', '…', 16) AS snippet
+                FROM songs_fts
+                JOIN songs_with_band ON songs_with_band.id = songs_fts.rowid
+                WHERE songs_fts MATCH ? AND songs_fts.rowid IN (
+                    SELECT rowid FROM songs_fts WHERE songs_fts MATCH ?
+                    ORDER BY bm25(songs_fts, 10.0, 1.0)
+                    LIMIT ? OFFSET ?
+                )
+                ORDER BY bm25(songs_fts, 10.0, 1.0)
+            ''' % self._song_columns(fields), (match, match, page_size, (page_index - 1) * page_size))
+            songs = [self.row_to_dict(row) for row in cursor.fetchall()]
+            for song in songs:
+                song["snippet"] = unsegment_cjk(song["snippet"])
+            return songs, total
 
+    @instrumented("db")
+    def get_changes(self, since: int = 0, limit: int = 100) -> Tuple[List[Dict[str, Any]], int, bool]:
+        """返回变更序号大于since的歌曲和墓碑，按序号升序，最多limit项
+
+        两个查询在同一个读事务中执行，看到的是同一个快照。
+        返回 (变更列表, 下次请求使用的since, 是否还有更多)；歌曲项deleted为False，
+        墓碑只有id、change_seq、deleted和deleted_at。
+        """
+        with self.get_connection() as conn:
+            conn.execute("BEGIN")
+            try:
+                # 各取limit + 1项，合并后的前limit项一定在其中
+                songs = conn.execute('''
+                    SELECT songs.id, songs.title, songs.author, lyrics_text(songs.lyrics, songs.lyrics_codec) AS lyrics,
+                           bands.name AS band, songs.created_at, songs.updated_at, songs.change_seq
+                    FROM songs JOIN bands ON bands.id = songs.band_id
+                    WHERE songs.change_seq > ?
+                    ORDER BY songs.change_seq LIMIT ?
+                ''', (since, limit + 1)).fetchall()
+                tombstones = conn.execute(
+                    "SELECT id, change_seq, deleted_at FROM song_tombstones WHERE change_seq > ? "
+                    "ORDER BY change_seq LIMIT ?", (since, limit + 1)
+                ).fetchall()
+            finally:
+                conn.commit()
+        changes = [dict(row, deleted=False) for row in songs] + [dict(row, deleted=True) for row in tombstones]
+        changes.sort(key=lambda change: change["change_seq"])
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        return changes, changes[-1]["change_seq"] if changes else since, has_more
+
+    @instrumented("db")
     def get_song_by_id(self, song_id: int) -> Optional[Dict[str, Any]]:
         """根据ID获取歌曲"""
-        conn = self.get_connection()
-        try:
+        with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM songs WHERE id = "+str(song_id))
+            cursor.execute("SELECT * FROM songs_with_band WHERE id = ?", (song_id,))
             rows = cursor.fetchone()
             return self.row_to_dict(rows)
-        finally:
-            conn.close()
 
-    def create_song(self, song_data: dict) -> int:
-        """创建新歌曲"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    @instrumented("db")
+    def create_song(self, song_data: dict) -> Optional[Dict[str, Any]]:
+        """创建新歌曲，INSERT ... RETURNING直接取回新行；乐队不存在时返回None"""
+        return self.submit_write(partial(self.insert_song_op, song_data)).result()
+
+    def insert_song_op(self, song_data: dict, conn: sqlite3.Connection) -> Optional[Dict[str, Any]]:
+        """create_song的写操作"""
+        now = datetime.now().isoformat()
         try:
-            cursor.execute("INSERT INTO songs (title,author,lyrics,band,created_at,updated_at) VALUES (?,?,?,?,?,?)", (song_data["title"], song_data[
-                           "author"], song_data["lyrics"], song_data["band"], datetime.now().isoformat(), datetime.now().isoformat()))
-            conn.commit()
-            cursor.execute("SELECT last_insert_rowid()")
-            res = cursor.fetchone()[0]
-            conn.close()
-            return res
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
-
-    def update_song(self, song_id: int, song_data: dict) -> bool:
-        """更新歌曲信息"""
-        song = self.get_song_by_id(song_id)
-        if song is None:
-            return False
-        conn = self.get_connection()
+            rows = conn.execute(
+                "INSERT INTO songs (title,author,lyrics,lyrics_codec,band_id,created_at,updated_at) "
+                "VALUES (?,?,?,?," + BAND_ID_BY_NAME + ",?,?) " + SONG_RETURNING,
+                (song_data["title"], song_data["author"], *compress_lyrics(song_data["lyrics"]), song_data["band"], now, now)
+            ).fetchall()
+        except sqlite3.IntegrityError:
+            return None
+        return self.row_to_dict(rows[0])
+
+    @instrumented("db")
+    def create_songs_bulk(self, songs: List[dict], chunk_size: int = BULK_BATCH_SIZE) -> Tuple[int, List[Tuple[int, str]]]:
+        """批量创建歌曲，每chunk_size行用一次executemany和一个事务
+
+        某个分块插入失败时回滚该分块并逐行重试，以定位出错的行。
+        返回 (成功插入的行数, [(songs中的下标, 错误信息)])。
+        """
+        sql = (
+            "INSERT INTO songs (title,author,lyrics,lyrics_codec,band_id,created_at,updated_at) "
+            "VALUES (?,?,?,?," + BAND_ID_BY_NAME + ",?,?)"
+        )
+        now = datetime.now().isoformat()
+        inserted = 0
+        errors = []
+        with self.get_connection() as conn:
+            for start in range(0, len(songs), chunk_size):
+                params = [
+                    (song["title"], song.get("author"), *compress_lyrics(song.get("lyrics")), song["band"], now, now)
+                    for song in songs[start:start + chunk_size]
+                ]
+                try:
+                    conn.executemany(sql, params)
+                    conn.commit()
+                    inserted += len(params)
+                    continue
+                except sqlite3.DatabaseError:
+                    conn.rollback()
+                for offset, row in enumerate(params):
+                    try:
+                        conn.execute(sql, row)
+                        inserted += 1
+                    except sqlite3.IntegrityError as e:
+                        errors.append((start + offset, "乐队不存在" if "band_id" in str(e) else str(e)))
+                    except sqlite3.DatabaseError as e:
+                        errors.append((start + offset, str(e)))
+                conn.commit()
+        return inserted, errors
+
+    def iter_song_batches(self, batch_size: int = BULK_BATCH_SIZE) -> Iterator[List[Dict[str, Any]]]:
+        """按ID顺序分批遍历全部歌曲，用同一个游标fetchmany，不会一次性载入整张表"""
+        with self.get_connection() as conn:
+            cursor = conn.execute("SELECT * FROM songs_with_band ORDER BY id")
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [self.row_to_dict(row) for row in rows]
+
+    def compress_existing_lyrics(self, batch_size: int = BULK_BATCH_SIZE) -> Tuple[int, int, int, int]:
+        """按当前压缩配置转换尚未压缩的歌词，每批一个事务，供管理命令使用
+
+        不修改updated_at，也不改变读取结果。返回 (检查的行数, 压缩的行数, 转换前字节数, 转换后字节数)。
+        """
+        checked = converted = bytes_before = bytes_after = 0
+        last_id = 0
+        with self.get_connection() as conn:
+            while True:
+                rows = conn.execute(
+                    "SELECT id, lyrics FROM songs WHERE id > ? AND lyrics_codec = ? AND lyrics IS NOT NULL "
+                    "ORDER BY id LIMIT ?", (last_id, LYRICS_PLAIN, batch_size)
+                ).fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1]["id"]
+                checked += len(rows)
+                updates = []
+                for row in rows:
+                    value, codec = compress_lyrics(row["lyrics"])
+                    if codec != LYRICS_PLAIN:
+                        updates.append((value, codec, row["id"]))
+                        bytes_before += len(row["lyrics"].encode("utf-8"))
+                        bytes_after += len(value)
+                conn.executemany("UPDATE songs SET lyrics = ?, lyrics_codec = ? WHERE id = ?", updates)
+                conn.commit()
+                converted += len(updates)
+        return checked, converted, bytes_before, bytes_after
+
+    @staticmethod
+    def _update_statement(song_data: dict) -> Tuple[str, List[Any]]:
+        """生成只SET已提供字段的UPDATE语句（歌曲ID参数留给调用方追加）"""
+        assignments = []
+        params = []
+        for column in UPDATABLE_SONG_COLUMNS:
+            value = song_data.get(column)
+            if value is None:
+                continue
+            if column == "band":
+                assignments.append("band_id=" + BAND_ID_BY_NAME)
+                params.append(value)
+            elif column == "lyrics":
+                assignments.append("lyrics=?, lyrics_codec=?")
+                params.extend(compress_lyrics(value))
+            else:
+                assignments.append("%s=?" % column)
+                params.append(value)
+        assignments.append("updated_at=?")
+        params.append(datetime.now().isoformat())
+        return "UPDATE songs SET %s WHERE id = ? %s" % (", ".join(assignments), SONG_RETURNING), params
+
+    @instrumented("db")
+    def update_song(self, song_id: int, song_data: dict) -> Optional[Dict[str, Any]]:
+        """更新歌曲信息，一条UPDATE完成修改并返回新行；歌曲或目标乐队不存在时返回None"""
+        return self.submit_write(partial(self.update_song_op, song_id, song_data)).result()
+
+    def update_song_op(self, song_id: int, song_data: dict, conn: sqlite3.Connection) -> Optional[Dict[str, Any]]:
+        """update_song的写操作"""
+        sql, params = self._update_statement(song_data)
         try:
-            if song_data.get("title") is not None:
-                conn.execute("UPDATE songs SET title=? WHERE id = ?",
-                             (song_data["title"], song_id))
-            if song_data.get("author") is not None:
-                conn.execute("UPDATE songs SET author=? WHERE id = ?",
-                             (song_data["author"], song_id))
-            if song_data.get("lyrics") is not None:
-                conn.execute("UPDATE songs SET lyrics=? WHERE id = ?",
-                             (song_data["lyrics"], song_id))
-            if song_data.get("band") is not None:
-                conn.execute("UPDATE songs SET band=? WHERE id = ?",
-                             (song_data["band"], song_id))
-            conn.execute("UPDATE songs SET updated_at=? WHERE id = ?",
-                         (datetime.now().isoformat(), song_id))
-            assert conn.total_changes > 0
+            rows = conn.execute(sql, params + [song_id]).fetchall()
+        except sqlite3.IntegrityError:
+            return None
+        return self.row_to_dict(rows[0]) if rows else None
+
+    @instrumented("db")
+    def update_songs_batch(self, updates: List[dict]) -> Tuple[List[Dict[str, Any]], List[Tuple[int, str]]]:
+        """在一个事务中批量更新歌曲，每项需包含id
+
+        任何一项失败都会回滚整个事务。
+        返回 (更新后的歌曲, [(updates中的下标, 错误信息)])，有错误时歌曲列表为空。
+        """
+        songs = []
+        errors = []
+        with self.get_connection() as conn:
+            for index, song_data in enumerate(updates):
+                sql, params = self._update_statement(song_data)
+                try:
+                    rows = conn.execute(sql, params + [song_data["id"]]).fetchall()
+                except sqlite3.IntegrityError:
+                    errors.append((index, "乐队不存在"))
+                    continue
+                if rows:
+                    songs.append(self.row_to_dict(rows[0]))
+                else:
+                    errors.append((index, "歌曲不存在"))
+            if errors:
+                conn.rollback()
+                return [], errors
             conn.commit()
-            return True
-        except Exception as e:
-            conn.rollback()
-            raise e
-            return False
-        finally:
-            conn.close()
+        return songs, errors
 
+    @instrumented("db")
     def delete_song(self, song_id: int) -> bool:
         """删除歌曲"""
-        song = self.get_song_by_id(song_id)
-        if song is None:
-            return False
-        conn = self.get_connection()
-        try:
-            conn.execute("DELETE FROM songs WHERE id = "+str(song_id))
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            raise e
-            return False
-        finally:
-            conn.close()
-            return True  # False表示删除失败
+        return self.submit_write(partial(self.delete_song_op, song_id)).result()
+
+    def delete_song_op(self, song_id: int, conn: sqlite3.Connection) -> bool:
+        """delete_song的写操作"""
+        rows = conn.execute("DELETE FROM songs WHERE id = ? RETURNING id", (song_id,)).fetchall()
+        return bool(rows)  # False表示歌曲不存在
@@ -0,0 +1,155 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from queue import LifoQueue, Empty, Full
+from typing import Dict, Any
+
+from services.metrics import DB_POOL_ACQUIRE_DURATION
+from services.lyrics_codec import decompress_lyrics
+from services.fts_text import segment_cjk
+
+
+class PoolTimeoutError(Exception):
+    """在超时时间内没有可用的数据库连接"""
+    pass
+
+
+class ConnectionPool:
+    """有界SQLite连接池，可在FastAPI的线程池中共享使用"""
+
+    def __init__(
+        self,
+        db_path: str,
+        pool_size: int = 8,
+        timeout: float = 5.0,
+        busy_timeout_ms: int = 5000,
+        cached_statements: int = 256
+    ):
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+
+        # LIFO：优先复用刚归还的连接，其语句缓存和页缓存更“热”
+        self._idle: LifoQueue = LifoQueue(maxsize=pool_size)
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._acquired = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._wait_time = 0.0
+
+    def _create_connection(self) -> sqlite3.Connection:
+        """创建一个新连接并设置PRAGMA"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        conn.row_factory = sqlite3.Row  # 使查询结果可以像字典一样访问
+        # WAL模式下读者不会被写者阻塞
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=%d" % self.busy_timeout_ms)
+        # songs.band_id引用bands.id，SQLite默认不检查外键
+        conn.execute("PRAGMA foreign_keys=ON")
+        # 视图和全文索引触发器通过该函数读取压缩的歌词
+        conn.create_function("lyrics_text", 2, decompress_lyrics, deterministic=True)
+        # 全文索引写入和查询前切分CJK文本
+        conn.create_function("fts_text", 1, segment_cjk, deterministic=True)
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        """借出一个连接，池满时最多等待timeout秒"""
+        acquire_start = time.perf_counter()
+        try:
+            conn = self._idle.get_nowait()
+        except Empty:
+            conn = None
+
+        if conn is None:
+            create = False
+            with self._lock:
+                if self._created < self.pool_size:
+                    self._created += 1
+                    create = True
+            if create:
+                try:
+                    conn = self._create_connection()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                start = time.perf_counter()
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise PoolTimeoutError("等待数据库连接超时")
+                with self._lock:
+                    self._waits += 1
+                    self._wait_time += time.perf_counter() - start
+
+        with self._lock:
+            self._in_use += 1
+            self._acquired += 1
+        DB_POOL_ACQUIRE_DURATION.observe(time.perf_counter() - acquire_start)
+        return conn
+
+    def release(self, conn: sqlite3.Connection):
+        """归还连接，未提交的事务会被回滚"""
+        with self._lock:
+            self._in_use -= 1
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put_nowait(conn)
+        except (sqlite3.Error, Full):
+            # 连接已损坏或池已满，直接丢弃
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+    @contextmanager
+    def connection(self):
+        """with块内使用连接，异常时回滚，结束后自动归还"""
+        conn = self.acquire()
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """关闭所有空闲连接"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """连接池统计信息"""
+        with self._lock:
+            return {
+                "pool_size": self.pool_size,
+                "timeout": self.timeout,
+                "created": self._created,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "acquired": self._acquired,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "avg_wait_ms": (self._wait_time / self._waits * 1000) if self._waits else 0.0
+            }
@@ -0,0 +1,76 @@
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows没有fcntl，只能保证单进程内的互斥
+    fcntl = None
+
+SHARED = "shared"
+EXCLUSIVE = "exclusive"
+
+
+class FileLock:
+    """基于fcntl.flock的进程间读写锁，同一进程内可重入
+
+    锁加在单独的锁文件上，而不是数据文件本身：数据文件会被os.replace替换，
+    加在旧inode上的锁对新文件无效。进程内各线程通过RLock串行化，
+    已持有共享锁时不能再申请排他锁（flock的升级不是原子的），写操作应在最外层直接申请排他锁。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+        self._mode = None
+        self._depth = 0
+        self._lock = threading.RLock()
+
+    def _flock(self, mode: str, blocking: bool = True) -> bool:
+        if fcntl is None:
+            return True
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        operation = fcntl.LOCK_SH if mode == SHARED else fcntl.LOCK_EX
+        if not blocking:
+            operation |= fcntl.LOCK_NB
+        try:
+            fcntl.flock(self._fd, operation)
+        except BlockingIOError:
+            return False
+        return True
+
+    @contextmanager
+    def _hold(self, mode: str, blocking: bool = True):
+        with self._lock:
+            if self._depth == 0:
+                if not self._flock(mode, blocking):
+                    yield False
+                    return
+                self._mode = mode
+            elif mode == EXCLUSIVE and self._mode != EXCLUSIVE:
+                raise RuntimeError("持有共享锁时不能申请排他锁")
+            self._depth += 1
+            try:
+                yield True
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    if fcntl is not None:
+                        fcntl.flock(self._fd, fcntl.LOCK_UN)
+                    self._mode = None
+
+    def shared(self):
+        """共享锁：读取数据文件时持有，多个进程可以同时读"""
+        return self._hold(SHARED)
+
+    def exclusive(self, blocking: bool = True):
+        """排他锁：读-改-写期间持有；blocking=False时拿不到锁立即返回，with块得到False"""
+        return self._hold(EXCLUSIVE, blocking)
+
+    def close(self):
+        """关闭锁文件描述符"""
+        with self._lock:
+            if self._fd is not None and self._depth == 0:
+                os.close(self._fd)
+                self._fd = None
@@ -2,22 +2,91 @@ import json
 import re
 from time import time
 from pydantic_core.core_schema import NullableSchema
-from thefuzz import fuzz, process
+from thefuzz import fuzz
 import os
-from typing import List, Dict, Optional
+import threading
+from bisect import insort, bisect_left, bisect_right
+from typing import List, Dict, Optional, Tuple, Iterator, Sequence
 from datetime import datetime
 
+from config import (
+    FILE_STORAGE_MODE, FILE_JOURNAL_MAX_BYTES, FILE_JOURNAL_MAX_RATIO,
+    FILE_JOURNAL_MIN_RECORDS, FILE_JOURNAL_FSYNC, BULK_BATCH_SIZE
+)
+from services.file_lock import FileLock
+from services.metrics import instrumented, STORAGE_BYTES_READ, STORAGE_BYTES_WRITTEN
+from services.search_index import NGramIndex
+from services.lyrics_codec import compress_lyrics_text, decompress_lyrics_text, LYRICS_PLAIN
+
+# 歌曲列表支持的排序字段，与数据库版本一致
+SONG_SORT_FIELDS = ("id", "title", "created_at", "updated_at")
+
 
 class FileManager:
-    def __init__(self):
-        self.band_file = "data/band_info.json"
-        self.song_file = "data/song_data.json"
-        self._ensure_data_files()
-        self._initialize_sample_data()
+    # 监控指标中的backend标签
+    metrics_backend = "file"
+
+    def __init__(self, data_dir: str = "data", storage_mode: str = FILE_STORAGE_MODE):
+        if storage_mode not in ("snapshot", "journal"):
+            raise ValueError("未知的存储模式: " + storage_mode)
+        self.data_dir = data_dir
+        self.storage_mode = storage_mode
+        self.band_file = os.path.join(data_dir, "band_info.json")
+        self.song_file = os.path.join(data_dir, "song_data.json")
+        self.journal_file = os.path.join(data_dir, "song_data.journal")
+
+        # 常驻内存的数据副本及索引，文件的mtime或大小变化时才重新解析
+        self._lock = threading.RLock()
+        self._bands: List[Dict] = []
+        self._bands_by_id: Dict[int, Dict] = {}
+        self._bands_by_name: Dict[str, Dict] = {}
+        self._bands_signature: Optional[Tuple[int, int, int]] = None
+        # 按ID递增的插入顺序保存，兼作歌曲的主存储
+        self._songs_by_id: Dict[int, Dict] = {}
+        self._songs_by_band: Dict[str, List[Dict]] = {}
+        # 每个乐队最近的歌曲更新时间（乐队统计用）
+        self._band_last_updated: Dict[str, str] = {}
+        self._songs_signature: Optional[Tuple[int, int, int]] = None
+        self._next_song_id = 1
+        # 变更流：已删除歌曲的墓碑（与歌曲一起保存在快照中，带deleted标记），
+        # 按序号升序的change_seq列表及序号到歌曲或墓碑的映射，最大的已分配序号
+        self._tombstones: Dict[int, Dict] = {}
+        self._change_seqs: List[int] = []
+        self._changes_by_seq: Dict[int, Dict] = {}
+        self._change_seq = 0
+        # 数据版本号，内存数据每次变化（写入或从磁盘重新加载）后递增，用于响应缓存和ETag
+        self.data_version = 0
+        # 标题/作者的n-gram倒排索引，模糊搜索前用于剪枝
+        self._title_index = NGramIndex()
+        self._author_index = NGramIndex()
+
+        # 日志模式状态：已回放到的字节偏移和记录数
+        self._journal_signature: Optional[Tuple[int, int, int]] = None
+        self._journal_offset = 0
+        self._journal_records = 0
+        self._compacting = False
+
+        # 多个worker进程共享数据文件：读取时加共享锁，读-改-写期间加排他锁
+        self._file_lock = FileLock(os.path.join(data_dir, ".lock"))
+        # 同一时刻只允许一个进程压缩日志
+        self._compact_lock = FileLock(os.path.join(data_dir, ".compact.lock"))
+
+    def initialize(self):
+        """确保数据文件存在并合并残留日志；由应用启动流程（lifespan）或管理命令调用
+
+        数据文件在第一次读取时才解析，这里不读取数据。
+        """
+        os.makedirs(self.data_dir, exist_ok=True)
+        with self._lock, self._file_lock.exclusive():
+            self._ensure_data_files()
+            if self.storage_mode == "snapshot" and os.path.exists(self.journal_file):
+                # 从日志模式切换回来时，先把残留日志合并进快照
+                if self.compact():
+                    os.remove(self.journal_file)
 
     def _ensure_data_files(self):
         """确保数据文件存在，如果不存在则创建空文件"""
-        os.makedirs("data", exist_ok=True)
+        os.makedirs(self.data_dir, exist_ok=True)
 
         if not os.path.exists(self.band_file):
             with open(self.band_file, 'w', encoding='utf-8') as f:
@@ -27,10 +96,11 @@ class FileManager:
             with open(self.song_file, 'w', encoding='utf-8') as f:
                 json.dump([], f, ensure_ascii=False, indent=2)
 
-    def _initialize_sample_data(self):
-        """初始化示例数据"""
-        bands = self._read_bands()
-        if not bands:
+    def seed(self) -> int:
+        """写入示例乐队数据，只通过管理命令调用；已有乐队时跳过，返回新增乐队数"""
+        with self._lock, self._file_lock.exclusive():
+            if self._load_bands():
+                return 0
             # 添加示例乐队数据
             sample_bands = [
                 {
@@ -65,6 +135,7 @@ class FileManager:
                 }
             ]
             self._write_bands(sample_bands)
+            return len(sample_bands)
 
     def _read_bands(self) -> List[Dict]:
         """读取乐队数据"""
@@ -72,13 +143,22 @@ class FileManager:
         raw_json = file.read()
         data_obj = json.loads(raw_json)
         file.close()
+        # json.dumps默认转义非ASCII字符，字符数即字节数
+        STORAGE_BYTES_READ.inc(self.metrics_backend, amount=len(raw_json))
         return data_obj
 
     def _write_bands(self, bands: List[Dict]):
-        """写入乐队数据"""
-        file = open(self.band_file, mode="w")
-        file.write(json.dumps(bands))
+        """写入乐队数据（先写临时文件再原子替换）"""
+        tmp_file = "%s.tmp.%d" % (self.band_file, os.getpid())
+        raw_json = json.dumps(bands)
+        file = open(tmp_file, mode="w")
+        file.write(raw_json)
         file.close()
+        STORAGE_BYTES_WRITTEN.inc(self.metrics_backend, amount=len(raw_json))
+        os.replace(tmp_file, self.band_file)
+        with self._lock:
+            self._index_bands(bands)
+            self._bands_signature = self._file_signature(self.band_file)
 
     def _read_songs(self) -> List[Dict]:
         """读取歌曲数据"""
@@ -86,148 +166,667 @@ class FileManager:
         raw_json = file.read()
         data_obj = json.loads(raw_json)
         file.close()
+        # json.dumps默认转义非ASCII字符，字符数即字节数
+        STORAGE_BYTES_READ.inc(self.metrics_backend, amount=len(raw_json))
         return data_obj
 
-    def _write_songs(self, songs: List[Dict]):
-        """写入歌曲数据"""
-        file = open(self.song_file, mode="w")
-        file.write(json.dumps(songs))
+    def _write_songs(self, songs: List[Dict], tmp_suffix: str = ".tmp"):
+        """写入歌曲快照（先写临时文件再原子替换，写到一半崩溃不会破坏原文件）"""
+        # 临时文件名带上进程号，多个worker不会写到同一个临时文件
+        tmp_file = "%s%s.%d" % (self.song_file, tmp_suffix, os.getpid())
+        raw_json = json.dumps(songs)
+        file = open(tmp_file, mode="w")
+        file.write(raw_json)
         file.close()
+        STORAGE_BYTES_WRITTEN.inc(self.metrics_backend, amount=len(raw_json))
+        os.replace(tmp_file, self.song_file)
+
+    # 内存缓存与索引
+    @staticmethod
+    def _file_signature(path: str) -> Optional[Tuple[int, int, int]]:
+        """文件的(inode, mtime, 大小)，用于判断是否需要重新解析；文件不存在时为None
+
+        写入都通过os.replace完成，inode必然变化，即使mtime精度不够、大小也恰好相同也能发现。
+        """
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _index_bands(self, bands: List[Dict]):
+        """重建乐队索引"""
+        self._bands = bands
+        self._bands_by_id = {band.get('id'): band for band in bands}
+        self._bands_by_name = {band.get('name'): band for band in bands}
+        self.data_version += 1
+
+    def _index_songs(self, songs: List[Dict]):
+        """重建歌曲索引（快照中带deleted标记的记录是墓碑）"""
+        self._songs_by_id = {}
+        self._songs_by_band = {}
+        self._band_last_updated = {}
+        self._tombstones = {}
+        self._title_index.clear()
+        self._author_index.clear()
+        for song in songs:
+            if song.get('deleted'):
+                self._tombstones[song.get('id')] = song
+                continue
+            self._songs_by_id[song.get('id')] = song
+            self._songs_by_band.setdefault(song.get('band'), []).append(song)
+            self._touch_band(song.get('band'), song.get('updated_at'))
+            self._title_index.add(song.get('id'), song.get('title'))
+            if song.get('author'):
+                self._author_index.add(song.get('id'), song.get('author'))
+        for band_songs in self._songs_by_band.values():
+            band_songs.sort(key=lambda k: k['id'])
+        self._index_changes()
+        # 已删除歌曲的ID不再复用，与数据库的AUTOINCREMENT一致
+        self._next_song_id = max(max(self._songs_by_id, default=0), max(self._tombstones, default=0)) + 1
+        self.data_version += 1
+
+    def _index_changes(self):
+        """重建变更流索引；早于变更流的歌曲没有序号，按(updated_at, id)的顺序补上
+
+        补序号只发生在内存中，解析同一份快照的各个进程得到相同的结果，下次写快照时一并保存。
+        """
+        records = list(self._songs_by_id.values()) + list(self._tombstones.values())
+        self._change_seq = max((record["change_seq"] for record in records if record.get("change_seq")), default=0)
+        legacy = [song for song in self._songs_by_id.values() if not song.get("change_seq")]
+        legacy.sort(key=lambda k: (k.get("updated_at") or "", k["id"]))
+        for song in legacy:
+            self._change_seq += 1
+            song["change_seq"] = self._change_seq
+        self._changes_by_seq = {record["change_seq"]: record for record in records}
+        self._change_seqs = sorted(self._changes_by_seq)
+
+    def _add_change(self, record: Dict):
+        """把歌曲或墓碑按序号加入变更流索引；新序号总是最大的，通常直接追加"""
+        seq = record["change_seq"]
+        self._changes_by_seq[seq] = record
+        if not self._change_seqs or seq > self._change_seqs[-1]:
+            self._change_seqs.append(seq)
+        else:
+            insort(self._change_seqs, seq)
+        self._change_seq = max(self._change_seq, seq)
+
+    def _drop_change(self, record: Optional[Dict]):
+        """从变更流索引中移除被替换的歌曲或墓碑"""
+        if record is None or self._changes_by_seq.get(record["change_seq"]) is not record:
+            return
+        seq = record["change_seq"]
+        del self._changes_by_seq[seq]
+        index = bisect_left(self._change_seqs, seq)
+        if index < len(self._change_seqs) and self._change_seqs[index] == seq:
+            del self._change_seqs[index]
+
+    def _next_change_seq(self) -> int:
+        """分配下一个变更序号（调用方持有排他锁，且已加载最新数据）"""
+        self._change_seq += 1
+        return self._change_seq
+
+    def _apply_put(self, song: Dict):
+        """在索引中插入或替换一首歌曲"""
+        old = self._songs_by_id.get(song["id"])
+        if old is not None:
+            self._songs_by_band[old.get("band")].remove(old)
+        if not song.get("change_seq"):
+            # 变更流之前写入的日志记录
+            song["change_seq"] = self._next_change_seq()
+        self._drop_change(old)
+        self._drop_change(self._tombstones.pop(song["id"], None))
+        self._add_change(song)
+        self._songs_by_id[song["id"]] = song
+        insort(self._songs_by_band.setdefault(song.get("band"), []), song, key=lambda k: k["id"])
+        if old is not None and old.get("band") != song.get("band"):
+            self._touch_band(old.get("band"), song.get("updated_at"))
+        self._touch_band(song.get("band"), song.get("updated_at"))
+        if old is None or old.get("title") != song.get("title"):
+            self._title_index.add(song["id"], song.get("title"))
+        if old is None or old.get("author") != song.get("author"):
+            self._author_index.remove(song["id"])
+            if song.get("author"):
+                self._author_index.add(song["id"], song.get("author"))
+        self._next_song_id = max(self._next_song_id, song["id"] + 1)
+        self.data_version += 1
+
+    def _apply_delete(self, song_id: int, tombstone: Optional[Dict] = None):
+        """从索引中删除一首歌曲，并记录它的墓碑（变更流之前写入的日志记录没有墓碑）"""
+        old = self._songs_by_id.pop(song_id, None)
+        if old is not None:
+            self._songs_by_band[old.get("band")].remove(old)
+            self._touch_band(old.get("band"), datetime.now().isoformat())
+            self._title_index.remove(song_id)
+            self._author_index.remove(song_id)
+            self._drop_change(old)
+            self.data_version += 1
+        if tombstone is not None:
+            self._drop_change(self._tombstones.get(song_id))
+            self._tombstones[song_id] = tombstone
+            self._add_change(tombstone)
+            self._next_song_id = max(self._next_song_id, song_id + 1)
+
+    def _touch_band(self, band_name: str, updated_at: Optional[str]):
+        """记录乐队歌曲的最近更新时间，与数据库band_stats.last_updated含义一致"""
+        if updated_at and updated_at > self._band_last_updated.get(band_name, ""):
+            self._band_last_updated[band_name] = updated_at
+
+    def _with_stats(self, band: Dict) -> Dict:
+        """在乐队数据上附加歌曲数和最近更新时间，直接取自按乐队分组的索引"""
+        name = band.get("name")
+        return dict(band, song_count=len(self._songs_by_band.get(name, ())),
+                    last_updated=self._band_last_updated.get(name))
+
+    def _load_bands(self) -> List[Dict]:
+        """返回内存中的乐队数据，文件被外部修改时重新加载"""
+        with self._lock:
+            if self._file_signature(self.band_file) != self._bands_signature:
+                with self._file_lock.shared():
+                    signature = self._file_signature(self.band_file)
+                    self._index_bands(self._read_bands())
+                    self._bands_signature = signature
+            return self._bands
+
+    def _load_songs(self) -> Dict[int, Dict]:
+        """返回内存中的歌曲数据，快照或日志被其他进程修改时增量/全量重新加载
+
+        先不加文件锁比较签名，文件没有变化时（绝大多数读请求）只需两次stat。
+        """
+        with self._lock:
+            if (self._file_signature(self.song_file) == self._songs_signature and
+                    self._file_signature(self.journal_file) == self._journal_signature):
+                return self._songs_by_id
+            with self._file_lock.shared():
+                signature = self._file_signature(self.song_file)
+                journal_signature = self._file_signature(self.journal_file)
+                journal_replaced = (journal_signature is not None and self._journal_signature is not None and
+                                    journal_signature[0] != self._journal_signature[0])
+                if journal_replaced or (journal_signature is not None and journal_signature[2] < self._journal_offset):
+                    # 日志被其他进程压缩过（替换为新文件），旧偏移在新文件中没有意义，需要从新快照重新开始。
+                    # 只看大小不够：新日志可能不比旧偏移短
+                    signature = None
+                if signature is None or signature != self._songs_signature:
+                    self._index_songs(self._read_songs())
+                    self._songs_signature = self._file_signature(self.song_file)
+                    self._journal_signature = None
+                    self._journal_offset = 0
+                    self._journal_records = 0
+                if journal_signature is not None and journal_signature != self._journal_signature:
+                    self._replay_journal()
+            return self._songs_by_id
+
+    # 日志模式
+    def _replay_journal(self):
+        """从上次的偏移开始回放日志，末尾不完整的一行（写入时崩溃）会被忽略"""
+        with open(self.journal_file, mode="rb") as file:
+            file.seek(self._journal_offset)
+            data = file.read()
+        STORAGE_BYTES_READ.inc(self.metrics_backend, amount=len(data))
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("op") == "put":
+                self._apply_put(record["song"])
+            elif record.get("op") == "del":
+                self._apply_delete(record["id"], record.get("tombstone"))
+            self._journal_records += 1
+        self._journal_offset += end
+        self._journal_signature = self._file_signature(self.journal_file)
+
+    def _append_journal(self, records: List[Dict]):
+        """把变更记录追加到日志末尾（调用方持有排他锁，且已回放完其他进程追加的记录）"""
+        payload = "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
+        with open(self.journal_file, mode="ab") as file:
+            if file.seek(0, os.SEEK_END) != self._journal_offset:
+                # 丢弃上次崩溃时残留的半行
+                file.truncate(self._journal_offset)
+            file.write(payload)
+            file.flush()
+            if FILE_JOURNAL_FSYNC:
+                os.fsync(file.fileno())
+        STORAGE_BYTES_WRITTEN.inc(self.metrics_backend, amount=len(payload))
+        self._journal_offset += len(payload)
+        self._journal_records += len(records)
+        self._journal_signature = self._file_signature(self.journal_file)
+
+    def _maybe_compact(self):
+        """日志超过大小阈值或记录数与存活歌曲数之比超过阈值时，在后台压缩"""
+        too_big = self._journal_offset >= FILE_JOURNAL_MAX_BYTES
+        too_many = (self._journal_records >= FILE_JOURNAL_MIN_RECORDS and
+                    self._journal_records >= FILE_JOURNAL_MAX_RATIO * len(self._songs_by_id))
+        if self._compacting or not (too_big or too_many):
+            return
+        self._compacting = True
+        threading.Thread(target=self.compact, daemon=True).start()
+
+    @instrumented("file")
+    def compact(self) -> bool:
+        """把日志合并进新快照；写快照期间不阻塞读写，期间新增的日志记录会被保留
+
+        其他进程正在压缩时直接返回False。
+        """
+        try:
+            with self._compact_lock.exclusive(blocking=False) as acquired:
+                if not acquired:
+                    return False
+                with self._lock:
+                    self._load_songs()
+                    songs = self._snapshot_records()
+                    offset = self._journal_offset
+                self._write_songs(songs, tmp_suffix=".compact")
+
+                with self._lock, self._file_lock.exclusive():
+                    # 新快照的内容就是内存中offset处的状态，不需要重新解析；
+                    # 只回放写快照期间其他进程追加的日志，使内存与日志末尾一致
+                    self._songs_signature = self._file_signature(self.song_file)
+                    self._load_songs()
+                    tail = b""
+                    if os.path.exists(self.journal_file):
+                        with open(self.journal_file, mode="rb") as file:
+                            file.seek(offset)
+                            tail = file.read()
+                        tail = tail[:tail.rfind(b"\n") + 1]
+                        tmp_file = "%s.compact.%d" % (self.journal_file, os.getpid())
+                        with open(tmp_file, mode="wb") as file:
+                            file.write(tail)
+                        # 先替换日志再记录快照签名；两次替换之间崩溃时重放旧日志也是幂等的
+                        os.replace(tmp_file, self.journal_file)
+                    self._songs_signature = self._file_signature(self.song_file)
+                    self._journal_signature = self._file_signature(self.journal_file)
+                    self._journal_offset = len(tail)
+                    self._journal_records = tail.count(b"\n")
+                return True
+        finally:
+            self._compacting = False
+
+    def _snapshot_records(self) -> List[Dict]:
+        """写入快照的全部记录：歌曲和墓碑"""
+        return list(self._songs_by_id.values()) + list(self._tombstones.values())
+
+    def _persist_songs(self, puts: List[Dict] = (), deletes: List[Dict] = ()):
+        """持久化一组歌曲变更（deletes为被删除歌曲的墓碑），成功后再同步内存索引"""
+        if self.storage_mode == "journal":
+            records = [{"op": "put", "song": song} for song in puts]
+            records += [{"op": "del", "id": tombstone["id"], "tombstone": tombstone} for tombstone in deletes]
+            self._append_journal(records)
+        else:
+            songs = dict(self._songs_by_id)
+            tombstones = dict(self._tombstones)
+            for song in puts:
+                songs[song["id"]] = song
+                tombstones.pop(song["id"], None)
+            for tombstone in deletes:
+                songs.pop(tombstone["id"], None)
+                tombstones[tombstone["id"]] = tombstone
+            self._write_songs(list(songs.values()) + list(tombstones.values()))
+            self._songs_signature = self._file_signature(self.song_file)
+        for song in puts:
+            self._apply_put(song)
+        for tombstone in deletes:
+            self._apply_delete(tombstone["id"], tombstone)
+        if self.storage_mode == "journal":
+            self._maybe_compact()
 
     def _generate_band_id(self) -> int:
         """生成乐队ID"""
-        bands = self._read_bands()
-        if not bands:
-            return 1
-        return max(band.get('id', 0) for band in bands) + 1
+        self._load_bands()
+        return max(self._bands_by_id, default=0) + 1
 
     def _generate_song_id(self) -> int:
         """生成歌曲ID"""
-        songs = self._read_songs()
-        if not songs:
-            return 1
-        return max(song.get('id', 0) for song in songs) + 1
+        self._load_songs()
+        return self._next_song_id
+
+    def get_data_version(self) -> int:
+        """返回当前数据版本号（会先检查文件是否被外部修改）"""
+        with self._lock:
+            self._load_bands()
+            self._load_songs()
+            return self.data_version
 
     # 乐队相关操作
-    def get_all_bands(self) -> List[Dict]:
+    @instrumented("file")
+    def get_all_bands(self, with_stats: bool = False) -> List[Dict]:
         """获取所有乐队"""
-        return self._read_bands()
+        if not with_stats:
+            return list(self._load_bands())
+        with self._lock:
+            bands = self._load_bands()
+            self._load_songs()
+            return [self._with_stats(band) for band in bands]
 
-    def get_band_by_name(self, name: str) -> Optional[Dict]:
+    @instrumented("file")
+    def get_band_by_name(self, name: str, with_stats: bool = False) -> Optional[Dict]:
         """根据名称获取乐队"""
-        all_bands = self._read_bands()
-        for k in all_bands:
-            if k["name"] == name:
-                return k
-        return None
+        with self._lock:
+            self._load_bands()
+            band = self._bands_by_name.get(name)
+            if band is None or not with_stats:
+                return band
+            self._load_songs()
+            return self._with_stats(band)
 
+    @instrumented("file")
     def get_band_by_id(self, band_id: int) -> Optional[Dict]:
         """根据ID获取乐队"""
-        bands = self._read_bands()
-        for band in bands:
-            if band.get('id') == band_id:
-                return band
-        return None
+        with self._lock:
+            self._load_bands()
+            return self._bands_by_id.get(band_id)
 
+    @instrumented("file")
     def create_band(self, band_data: Dict) -> Dict:
         """创建新乐队"""
-        bands = self._read_bands()
-
-        # 检查乐队名称是否已存在
-        if any(band.get('name') == band_data.get('name') for band in bands):
-            raise ValueError("乐队名称已存在")
+        with self._lock, self._file_lock.exclusive():
+            # 检查乐队名称是否已存在
+            if self.get_band_by_name(band_data.get('name')) is not None:
+                raise ValueError("乐队名称已存在")
 
-        # 生成新ID和时间戳
-        band_data['id'] = self._generate_band_id()
-        band_data['created_at'] = datetime.now().isoformat()
+            # 生成新ID和时间戳
+            band_data['id'] = self._generate_band_id()
+            band_data['created_at'] = datetime.now().isoformat()
 
-        bands.append(band_data)
-        self._write_bands(bands)
-        return band_data
+            bands = self._load_bands() + [band_data]
+            self._write_bands(bands)
+            return band_data
 
     # 歌曲相关操作
+    @staticmethod
+    def _encode_lyrics(song: Dict) -> Dict:
+        """把song中的明文歌词按配置压缩并设置lyrics_codec（原地修改），存储的歌曲都经过这一步"""
+        lyrics, codec = compress_lyrics_text(song.get("lyrics"))
+        song["lyrics"] = lyrics
+        if codec == LYRICS_PLAIN:
+            song.pop("lyrics_codec", None)
+        else:
+            song["lyrics_codec"] = codec
+        return song
+
+    @staticmethod
+    def decode_song(song: Dict) -> Dict:
+        """返回歌词为明文的歌曲；未压缩时直接返回原对象"""
+        codec = song.get("lyrics_codec")
+        if not codec:
+            return song
+        decoded = dict(song, lyrics=decompress_lyrics_text(song.get("lyrics"), codec))
+        del decoded["lyrics_codec"]
+        return decoded
+
+    @instrumented("file")
     def get_all_songs(self) -> List[Dict]:
-        """获取所有歌曲"""
-        songs = self._read_songs()
-        return songs
+        """获取所有歌曲（存储形式，歌词可能是压缩的，输出前用project_song或decode_song转换）"""
+        with self._lock:
+            return list(self._load_songs().values())
 
+    @instrumented("file")
     def get_song_by_id(self, song_id: int) -> Optional[Dict]:
         """根据ID获取歌曲"""
-        songs = self._read_songs()
-        for song in songs:
-            if song.get('id') == song_id:
-                return song
-        return None
+        with self._lock:
+            song = self._load_songs().get(song_id)
+        return None if song is None else self.decode_song(song)
+
+    @instrumented("file")
+    def get_changes(self, since: int = 0, limit: int = 100) -> Tuple[List[Dict], int, bool]:
+        """返回变更序号大于since的歌曲和墓碑，按序号升序，最多limit项
+
+        返回值与DatabaseManager.get_changes相同。序号列表有序，定位since只需二分查找，
+        一次同步的开销与变更数成正比。
+        """
+        with self._lock:
+            self._load_songs()
+            start = bisect_right(self._change_seqs, since)
+            records = [self._changes_by_seq[seq] for seq in self._change_seqs[start:start + limit + 1]]
+        has_more = len(records) > limit
+        changes = [dict(record) if record.get("deleted") else dict(self.decode_song(record), deleted=False)
+                   for record in records[:limit]]
+        return changes, changes[-1]["change_seq"] if changes else since, has_more
 
+    @staticmethod
+    def project_song(song: Dict, fields: Optional[Sequence[str]]) -> Dict:
+        """只保留fields中的字段（id与搜索分数总会保留），fields为None时返回全部字段
+
+        只有选中了lyrics时才解压歌词。
+        """
+        if fields is None or "lyrics" in fields:
+            song = FileManager.decode_song(song)
+        if fields is None:
+            return song
+        projected = {name: song.get(name) for name in fields}
+        projected["id"] = song["id"]
+        if "score" in song:
+            projected["score"] = song["score"]
+        return projected
+
+    @instrumented("file")
     def get_songs_by_band(self, band_name: str) -> List[Dict]:
-        """根据乐队获取歌曲"""
-        result = []
-        all_songs = self.get_all_songs()
-        for i in all_songs:
-            if i["band"] == band_name:
-                result.append(i)
-        return result
+        """根据乐队获取歌曲（存储形式，同get_all_songs）"""
+        with self._lock:
+            self._load_songs()
+            return list(self._songs_by_band.get(band_name, []))
+
+    @instrumented("file")
+    def search_songs_by_title(
+        self,
+        title: str,
+        limit: Optional[int] = 5,
+        score_cutoff: int = 0,
+        include_author: bool = False
+    ) -> List[Dict]:
+        """根据标题（可选同时匹配作者）模糊搜索歌曲
+
+        先用n-gram倒排索引筛出候选，再只对候选的标题/作者计算fuzz.WRatio。
+        返回按分数降序排列的歌曲副本（存储形式，同get_all_songs），每首附带score字段；
+        limit为None时返回全部达标结果。
+        """
+        with self._lock:
+            self._load_songs()
+            # 候选集合要比最终结果宽一些，避免n-gram相似度和WRatio的排序差异漏掉结果
+            max_candidates = None if limit is None else max(limit * 10, 50)
+            candidate_ids = {doc_id for doc_id, _ in self._title_index.candidates(title, max_candidates)}
+            if include_author:
+                candidate_ids.update(
+                    doc_id for doc_id, _ in self._author_index.candidates(title, max_candidates))
+            candidates = [self._songs_by_id[doc_id] for doc_id in candidate_ids]
 
-    def search_songs_by_title(self, title: str) -> List[Dict]:
-        """根据标题搜索歌曲"""
-        all_songs = self.get_all_songs()
-        filtered = process.extract(title, all_songs)
         result = []
-        for (item, score) in filtered:
-            result.append(item)
+        for song in candidates:
+            score = fuzz.WRatio(title, song.get("title") or "")
+            if include_author and song.get("author"):
+                score = max(score, fuzz.WRatio(title, song["author"]))
+            if score >= score_cutoff:
+                result.append(dict(song, score=score))
+        result.sort(key=lambda k: (-k["score"], k["id"]))
+        if limit is not None:
+            result = result[:limit]
         return result
 
+    @instrumented("file")
+    def query_songs(
+        self,
+        band: Optional[str] = None,
+        title: Optional[str] = None,
+        author: Optional[str] = None,
+        title_prefix: Optional[str] = None,
+        sort: Optional[str] = None,
+        descending: bool = False,
+        score_cutoff: int = 0
+    ) -> List[Dict]:
+        """按乐队、标题（模糊）、作者和标题前缀组合过滤歌曲，各条件之间为AND
+
+        从最窄的索引开始取候选：有标题时用模糊搜索，否则有乐队时用乐队索引，再逐条检查其余条件。
+        sort为None时保持候选的顺序（模糊搜索按相关度，其余按ID），否则按(sort字段, id)排序。
+        返回存储形式的歌曲（同get_all_songs），模糊搜索的结果附带score字段。
+        """
+        if title is not None:
+            songs = self.search_songs_by_title(title, limit=None, score_cutoff=score_cutoff)
+        elif band is not None:
+            songs = self.get_songs_by_band(band)
+        else:
+            songs = self.get_all_songs()
+        if band is not None and title is not None:
+            songs = [song for song in songs if song.get("band") == band]
+        if author is not None:
+            songs = [song for song in songs if song.get("author") == author]
+        if title_prefix:
+            songs = [song for song in songs if (song.get("title") or "").startswith(title_prefix)]
+        if sort == "id" and not descending and title is None:
+            # 乐队索引和全部歌曲本来就按ID递增
+            return songs
+        if sort is not None:
+            if sort not in SONG_SORT_FIELDS:
+                raise ValueError("不支持的排序字段: " + sort)
+            if sort == "id":
+                songs.sort(key=lambda k: k["id"], reverse=descending)
+            else:
+                # 缺失的字段排在最前，与SQLite中NULL的排序一致
+                songs.sort(key=lambda k: (k.get(sort) is not None, k.get(sort) or "", k["id"]), reverse=descending)
+        return songs
+
+    @instrumented("file")
     def create_song(self, song_data: Dict) -> Dict:
         """创建新歌曲"""
-        # 验证乐队是否存在
-        if song_data["band"] is not None:
-            band = self.get_band_by_name(song_data["band"])
-            if band is None:
+        with self._lock, self._file_lock.exclusive():
+            # 验证乐队是否存在
+            if song_data["band"] is not None:
+                band = self.get_band_by_name(song_data["band"])
+                if band is None:
+                    return {}
+            # 生成新ID和时间戳
+            if song_data["title"] is None:
                 return {}
-        # 生成新ID和时间戳
-        if song_data["title"] is None:
-            return {}
-        new_id = self._generate_song_id()
-        timestamp = datetime.now().isoformat()
-        all_songs = self._read_songs()
-        song_data["created_at"] = song_data["updated_at"] = timestamp
-        song_data["id"] = new_id
-        all_songs.append(song_data)
-        self._write_songs(all_songs)
-        return song_data
+            new_id = self._generate_song_id()
+            timestamp = datetime.now().isoformat()
+            song_data["created_at"] = song_data["updated_at"] = timestamp
+            song_data["id"] = new_id
+            song_data["change_seq"] = self._next_change_seq()
+            self._persist_songs(puts=[self._encode_lyrics(dict(song_data))])
+            return song_data
 
-    def update_song(self, song_id: int, song_data: Dict) -> Optional[Dict]:
-        """更新歌曲"""
+    @instrumented("file")
+    def create_songs_bulk(self, songs: List[Dict]) -> Tuple[int, List[Tuple[int, str]]]:
+        """批量创建歌曲，全部变更只写一次文件（或追加一次日志）
+
+        返回 (成功创建的数量, [(songs中的下标, 错误信息)])。
+        """
+        with self._lock, self._file_lock.exclusive():
+            self._load_bands()
+            new_id = self._generate_song_id()
+            timestamp = datetime.now().isoformat()
+            puts = []
+            errors = []
+            for index, song_data in enumerate(songs):
+                if song_data.get("title") is None:
+                    errors.append((index, "缺少歌曲标题"))
+                    continue
+                if song_data.get("band") not in self._bands_by_name:
+                    errors.append((index, "乐队不存在"))
+                    continue
+                song = self._encode_lyrics(dict(song_data, id=new_id, created_at=timestamp, updated_at=timestamp,
+                                                change_seq=self._next_change_seq()))
+                new_id += 1
+                puts.append(song)
+            if puts:
+                self._persist_songs(puts=puts)
+            return len(puts), errors
+
+    def iter_song_batches(self, batch_size: int = BULK_BATCH_SIZE) -> Iterator[List[Dict]]:
+        """按ID顺序分批遍历全部歌曲；只复制ID列表，遍历期间被删除的歌曲会被跳过"""
+        with self._lock:
+            song_ids = list(self._load_songs())
+        for start in range(0, len(song_ids), batch_size):
+            with self._lock:
+                batch = [self._songs_by_id.get(song_id) for song_id in song_ids[start:start + batch_size]]
+            # 导出格式与数据库版本一致，不含变更序号
+            yield [{key: value for key, value in self.decode_song(song).items() if key != "change_seq"}
+                   for song in batch if song is not None]
+
+    def compress_existing_lyrics(self) -> Tuple[int, int, int, int]:
+        """按当前压缩配置转换尚未压缩的歌词并写回，供管理命令使用
+
+        返回 (检查的歌曲数, 压缩的歌曲数, 转换前字节数, 转换后字节数)。
+        """
+        with self._lock, self._file_lock.exclusive():
+            songs = self._load_songs()
+            puts = []
+            bytes_before = bytes_after = 0
+            for song in songs.values():
+                if song.get("lyrics_codec") or song.get("lyrics") is None:
+                    continue
+                encoded = self._encode_lyrics(dict(song))
+                if encoded.get("lyrics_codec"):
+                    puts.append(encoded)
+                    bytes_before += len(song["lyrics"].encode("utf-8"))
+                    bytes_after += len(encoded["lyrics"])
+            if puts:
+                self._persist_songs(puts=puts)
+            return len(songs), len(puts), bytes_before, bytes_after
+
+    def _build_update(self, old: Optional[Dict], song_data: Dict) -> Tuple[Optional[Dict], Optional[str]]:
+        """在旧歌曲的副本上应用更新（未提供的字段保持不变），返回 (新歌曲, 错误信息)"""
+        if old is None:
+            return None, "歌曲不存在"
         # 验证乐队是否存在
         band_name = song_data.get("band")
-        if band_name is not None:
-            band = self.get_band_by_name(song_data["band"])
-            if band is None:
+        if band_name is not None and self.get_band_by_name(band_name) is None:
+            return None, "乐队不存在"
+        song = dict(old)
+        changes = {k: v for k, v in song_data.items() if v is not None and k != "id"}
+        song.update(changes)
+        if "lyrics" in changes:
+            self._encode_lyrics(song)
+        # 修改更新时间
+        song["updated_at"] = datetime.now().isoformat()
+        song["change_seq"] = self._next_change_seq()
+        return song, None
+
+    @instrumented("file")
+    def update_song(self, song_id: int, song_data: Dict) -> Optional[Dict]:
+        """更新歌曲"""
+        with self._lock, self._file_lock.exclusive():
+            song, error = self._build_update(self._load_songs().get(song_id), song_data)
+            if song is None:
                 return None
-        # 更新字段
-        all_songs = self.get_all_songs()
-        for k in all_songs:
-            if k.get("id") == song_id:
-                k.update(song_data)
-                # 修改更新时间
-                k["updated_at"] = datetime.now().isoformat()
-                self._write_songs(all_songs)
-                return k
-        return None
+            self._persist_songs(puts=[song])
+            return self.decode_song(song)
+
+    @instrumented("file")
+    def update_songs_batch(self, updates: List[Dict]) -> Tuple[List[Dict], List[Tuple[int, str]]]:
+        """批量更新歌曲，每项需包含id；全部校验通过后只写一次文件（或追加一次日志）
 
+        返回 (更新后的歌曲, [(updates中的下标, 错误信息)])，有错误时不做任何修改。
+        """
+        with self._lock, self._file_lock.exclusive():
+            # 同一首歌在批次中出现多次时，后面的更新叠加在前面的结果上
+            pending: Dict[int, Dict] = {}
+            songs = []
+            errors = []
+            for index, song_data in enumerate(updates):
+                song_id = song_data["id"]
+                old = pending.get(song_id) or self._load_songs().get(song_id)
+                song, error = self._build_update(old, song_data)
+                if song is None:
+                    errors.append((index, error))
+                    continue
+                pending[song_id] = song
+                songs.append(song)
+            if errors:
+                return [], errors
+            if pending:
+                self._persist_songs(puts=list(pending.values()))
+            return [self.decode_song(song) for song in songs], errors
+
+    @instrumented("file")
     def delete_song(self, song_id: int) -> bool:
         """删除歌曲"""
-        data = self._read_songs()
-        data_new = []
-        found = False
-        for i in data:
-            if i.get("id") != song_id:
-                data_new.append(i)
-            else:
-                found = True
-
-        if found:
-            self._write_songs(data_new)
+        with self._lock, self._file_lock.exclusive():
+            if song_id not in self._load_songs():
+                return False  # False表示删除失败
+            tombstone = {"id": song_id, "deleted": True, "change_seq": self._next_change_seq(),
+                         "deleted_at": datetime.now().isoformat()}
+            self._persist_songs(deletes=[tombstone])
             return True
-        else:
-            return False  # False表示删除失败
@@ -0,0 +1,24 @@
+import re
+from typing import Optional
+
+# unicode61分词器把连续的汉字、假名当作一个词，“春日影”里搜不到“日影”。
+# 写入全文索引前在每个CJK字符两侧插入零宽空格（unicode61视其为分隔符），每个字成为一个词，
+# 查询时同样切分，多字词变成相邻字组成的短语，等价于子串匹配
+FTS_SEPARATOR = "\u200b"
+_CJK_CHAR = re.compile(
+    "([\u3040-\u30ff\u31f0-\u31ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff66-\uff9f"
+    "\U00020000-\U0002fa1f])")
+
+
+def segment_cjk(text: Optional[str]) -> Optional[str]:
+    """把CJK字符切分为单字词；也注册为SQLite函数fts_text(text)，供全文索引的内容视图和触发器使用"""
+    if not text:
+        return text
+    return _CJK_CHAR.sub(FTS_SEPARATOR + r"\1" + FTS_SEPARATOR, text)
+
+
+def unsegment_cjk(text: Optional[str]) -> Optional[str]:
+    """去掉segment_cjk插入的分隔符，用于snippet()返回的片段"""
+    if not text:
+        return text
+    return text.replace(FTS_SEPARATOR, "")
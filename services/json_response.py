@@ -0,0 +1,51 @@
+import json
+from functools import lru_cache
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+
+from services.profiling import timed
+
+try:
+    import orjson
+except ImportError:  # orjson是可选依赖，没有时退回标准库json
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """把由dict/list/str/数字组成的数据编码为JSON字节串，遇到其他类型时交给jsonable_encoder"""
+    with timed("serialize"):
+        if orjson is not None:
+            return orjson.dumps(content, default=jsonable_encoder)
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=jsonable_encoder).encode("utf-8")
+
+
+@lru_cache(maxsize=None)
+def _adapter(response_type) -> TypeAdapter:
+    """每个响应类型只构建一次TypeAdapter"""
+    return TypeAdapter(response_type)
+
+
+def validated_json(response_type, data: Any, exclude_unset: bool = False) -> bytes:
+    """把存储层返回的原始数据按响应模型校验一次，再由pydantic-core直接编码为JSON
+
+    替代“构造模型对象 + response_model再校验一次 + jsonable_encoder”的路径：
+    时间字符串只解析一次，也不经过Python层的逐字段编码。
+    """
+    adapter = _adapter(response_type)
+    with timed("validate"):
+        value = adapter.validate_python(data)
+    with timed("serialize"):
+        return adapter.dump_json(value, exclude_unset=exclude_unset)
+
+
+class FastJSONResponse(Response):
+    """JSON响应：bytes视为已编码好的响应体直接返回，其他内容用dumps编码"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
@@ -0,0 +1,48 @@
+import base64
+import zlib
+from typing import Any, Optional, Tuple
+
+from config import LYRICS_COMPRESSION, LYRICS_COMPRESS_MIN_BYTES, LYRICS_COMPRESS_LEVEL
+
+# 歌词编码标记（数据库songs.lyrics_codec列、文件存储歌曲的lyrics_codec字段）
+LYRICS_PLAIN = 0
+LYRICS_ZLIB = 1
+
+
+def compress_lyrics(lyrics: Optional[str]) -> Tuple[Any, int]:
+    """返回 (存储值, 编码标记)：较长的歌词压缩为zlib字节串，短歌词或压缩无收益时原样保存"""
+    if lyrics is None or not LYRICS_COMPRESSION:
+        return lyrics, LYRICS_PLAIN
+    raw = lyrics.encode("utf-8")
+    if len(raw) < LYRICS_COMPRESS_MIN_BYTES:
+        return lyrics, LYRICS_PLAIN
+    packed = zlib.compress(raw, LYRICS_COMPRESS_LEVEL)
+    if len(packed) >= len(raw):
+        return lyrics, LYRICS_PLAIN
+    return packed, LYRICS_ZLIB
+
+
+def decompress_lyrics(value: Any, codec: Optional[int]) -> Optional[str]:
+    """按编码标记还原歌词；也注册为SQLite函数lyrics_text(lyrics, lyrics_codec)"""
+    if codec == LYRICS_ZLIB and value is not None:
+        return zlib.decompress(value).decode("utf-8")
+    return value
+
+
+def compress_lyrics_text(lyrics: Optional[str]) -> Tuple[Optional[str], int]:
+    """JSON文件用的文本形式：压缩结果再做base64编码"""
+    value, codec = compress_lyrics(lyrics)
+    if codec == LYRICS_PLAIN:
+        return value, codec
+    text = base64.b64encode(value).decode("ascii")
+    # base64多出约1/3，压缩率不够时不值得
+    if len(text) >= len(lyrics.encode("utf-8")):
+        return lyrics, LYRICS_PLAIN
+    return text, codec
+
+
+def decompress_lyrics_text(value: Optional[str], codec: Optional[int]) -> Optional[str]:
+    """还原compress_lyrics_text的结果"""
+    if codec == LYRICS_ZLIB and value is not None:
+        return decompress_lyrics(base64.b64decode(value), codec)
+    return value
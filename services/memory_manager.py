@@ -0,0 +1,98 @@
+import threading
+from typing import List, Dict
+
+from config import MEMORY_SNAPSHOT_INTERVAL, MEMORY_SNAPSHOT_WRITES
+from services.file_manager import FileManager
+
+
+class MemoryManager(FileManager):
+    """常驻内存的存储：启动时从JSON快照加载，之后读写只操作内存中的字典和索引
+
+    写入不做任何文件I/O，由后台线程每隔snapshot_interval秒、或累计snapshot_writes次写入后，
+    把整份歌曲数据原子地写回快照文件（临时文件+os.replace）。进程崩溃时最多丢失最近一个周期的写入。
+    """
+    metrics_backend = "memory"
+
+    def __init__(
+        self,
+        data_dir: str = "data",
+        snapshot_interval: float = MEMORY_SNAPSHOT_INTERVAL,
+        snapshot_writes: int = MEMORY_SNAPSHOT_WRITES
+    ):
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_writes = snapshot_writes
+        # 加载完成前按文件存储的方式从磁盘读取
+        self._loaded = False
+        self._dirty_writes = 0
+        self._snapshot_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._snapshot_thread = None
+        super().__init__(data_dir, storage_mode="snapshot")
+
+    def initialize(self):
+        """把全部数据载入内存并启动快照线程"""
+        super().initialize()
+        self._load_bands()
+        self._load_songs()
+        self._loaded = True
+        self._snapshot_thread = threading.Thread(target=self._snapshot_loop, name="memory-snapshot", daemon=True)
+        self._snapshot_thread.start()
+
+    def _load_bands(self) -> List[Dict]:
+        """加载完成后不再检查文件，内存中的数据即为权威副本"""
+        if self._loaded:
+            return self._bands
+        return super()._load_bands()
+
+    def _load_songs(self) -> Dict[int, Dict]:
+        if self._loaded:
+            return self._songs_by_id
+        return super()._load_songs()
+
+    def _persist_songs(self, puts: List[Dict] = (), deletes: List[Dict] = ()):
+        """只更新内存索引，累计写入次数达到阈值时唤醒快照线程"""
+        for song in puts:
+            self._apply_put(song)
+        for tombstone in deletes:
+            self._apply_delete(tombstone["id"], tombstone)
+        self._dirty_writes += 1
+        if self._dirty_writes >= self.snapshot_writes:
+            self._wakeup.set()
+
+    def snapshot(self):
+        """把当前内存数据写入快照文件；没有未保存的写入时直接返回"""
+        with self._snapshot_lock:
+            with self._lock:
+                if not self._dirty_writes:
+                    return
+                # 歌曲和墓碑字典写入后不会被原地修改，浅拷贝列表即可在锁外序列化
+                songs = self._snapshot_records()
+                dirty_writes = self._dirty_writes
+                self._dirty_writes = 0
+            try:
+                self._write_songs(songs, tmp_suffix=".snapshot")
+            except Exception:
+                with self._lock:
+                    self._dirty_writes += dirty_writes
+                raise
+
+    def _snapshot_loop(self):
+        """后台快照线程"""
+        while not self._closed:
+            self._wakeup.wait(self.snapshot_interval)
+            self._wakeup.clear()
+            try:
+                self.snapshot()
+            except OSError as e:
+                print("内存存储快照写入失败:", e)
+
+    def close(self):
+        """停止快照线程并写入最后一次快照"""
+        self._closed = True
+        if self._snapshot_thread is None:
+            # 未初始化，内存中没有数据
+            return
+        self._wakeup.set()
+        self._snapshot_thread.join()
+        self.snapshot()
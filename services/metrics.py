@@ -0,0 +1,275 @@
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# 默认的延迟直方图分桶（秒）
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    """转义Prometheus标签值"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = ['%s="%s"' % (name, _escape(value)) for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """带标签的指标基类"""
+    type_name = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return ["# HELP %s %s" % (self.name, self.help_text), "# TYPE %s %s" % (self.name, self.type_name)]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+    type_name = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [self.name + _format_labels(self.labelnames, labels) + " " + _format_value(value)
+                for labels, value in items]
+
+
+class Gauge(_Metric):
+    """可增可减的瞬时值"""
+    type_name = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def dec(self, *labelvalues: str, amount: float = 1.0):
+        self.inc(*labelvalues, amount=-amount)
+
+    def set(self, value: float, *labelvalues: str):
+        with self._lock:
+            self._values[labelvalues] = value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [self.name + _format_labels(self.labelnames, labels) + " " + _format_value(value)
+                for labels, value in items]
+
+
+class CallbackGauge(_Metric):
+    """抓取时才通过回调计算的瞬时值，适合连接池、缓存等已有统计"""
+    type_name = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str],
+                 callback: Callable[[], Iterable[Tuple[Tuple[str, ...], float]]]):
+        super().__init__(name, help_text, labelnames)
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        return [self.name + _format_labels(self.labelnames, labels) + " " + _format_value(value)
+                for labels, value in self.callback()]
+
+
+class Histogram(_Metric):
+    """分桶直方图"""
+    type_name = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 每组标签：[各桶计数..., 总和, 总数]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labelvalues: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labelvalues)
+            if state is None:
+                state = self._values[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(labels, list(state)) for labels, state in self._values.items()]
+        lines = []
+        for labels, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state):
+                cumulative += count
+                lines.append(self.name + "_bucket" +
+                             _format_labels(self.labelnames, labels, 'le="%s"' % _format_value(bound)) +
+                             " " + str(cumulative))
+            lines.append(self.name + "_sum" + _format_labels(self.labelnames, labels) + " " + _format_value(state[-2]))
+            lines.append(self.name + "_count" + _format_labels(self.labelnames, labels) + " " + str(state[-1]))
+        return lines
+
+
+class Registry:
+    """指标注册表，按Prometheus文本格式输出"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP请求处理耗时", ("method", "route", "status")))
+HTTP_REQUESTS_IN_PROGRESS = REGISTRY.register(Gauge(
+    "http_requests_in_progress", "正在处理的HTTP请求数", ("method",)))
+STORAGE_OPERATION_DURATION = REGISTRY.register(Histogram(
+    "storage_operation_duration_seconds", "存储层方法耗时", ("backend", "operation")))
+STORAGE_OPERATION_ERRORS = REGISTRY.register(Counter(
+    "storage_operation_errors_total", "存储层方法抛出的异常数", ("backend", "operation")))
+STORAGE_ROWS_RETURNED = REGISTRY.register(Counter(
+    "storage_rows_returned_total", "存储层方法返回的行数", ("backend", "operation")))
+STORAGE_BYTES_READ = REGISTRY.register(Counter(
+    "storage_bytes_read_total", "从数据文件读取的字节数", ("backend",)))
+STORAGE_BYTES_WRITTEN = REGISTRY.register(Counter(
+    "storage_bytes_written_total", "写入数据文件的字节数", ("backend",)))
+DB_POOL_ACQUIRE_DURATION = REGISTRY.register(Histogram(
+    "db_pool_acquire_seconds", "从连接池借出连接的耗时（含新建连接）"))
+DB_WRITE_BATCH_OPS = REGISTRY.register(Histogram(
+    "db_write_batch_size", "组提交时每个事务合并的写操作数", buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)))
+DB_WRITE_QUEUE_WAIT = REGISTRY.register(Histogram(
+    "db_write_queue_wait_seconds", "写操作从入队到所在事务提交的耗时"))
+
+
+def register_stats_gauge(name: str, help_text: str, stats: Callable[[], Dict], keys: Sequence[str]) -> CallbackGauge:
+    """把已有的stats()字典按stat标签暴露为指标，抓取时才读取"""
+    def callback():
+        values = stats()
+        return [((key,), values[key]) for key in keys]
+    return REGISTRY.register(CallbackGauge(name, help_text, ("stat",), callback))
+
+
+def _count_rows(result) -> int:
+    """估算存储方法返回的行数"""
+    if result is None or isinstance(result, (bool, int)):
+        return 0
+    if isinstance(result, dict):
+        return 1
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple) and result and isinstance(result[0], list):
+        return len(result[0])
+    return 0
+
+
+@contextmanager
+def operation_metrics(backend_label: str, operation: str):
+    """记录代码块的耗时和异常数；代码块把结果传给yield出的函数，用于统计返回行数"""
+    results = []
+    start = time.perf_counter()
+    try:
+        yield results.append
+    except Exception:
+        STORAGE_OPERATION_ERRORS.inc(backend_label, operation)
+        raise
+    finally:
+        STORAGE_OPERATION_DURATION.observe(time.perf_counter() - start, backend_label, operation)
+    rows = _count_rows(results[0]) if results else 0
+    if rows:
+        STORAGE_ROWS_RETURNED.inc(backend_label, operation, amount=rows)
+
+
+def instrumented(backend: str):
+    """存储方法装饰器：记录耗时、返回行数和异常数
+
+    实例的metrics_backend属性优先于backend参数，子类继承的方法可以使用自己的标签。
+    """
+    def decorator(func):
+        operation = func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with operation_metrics(getattr(args[0], "metrics_backend", backend), operation) as record:
+                result = func(*args, **kwargs)
+                record(result)
+            return result
+        return wrapper
+    return decorator
+
+
+class MetricsMiddleware:
+    """纯ASGI中间件：按方法、路由模板和状态码记录请求耗时"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_PROGRESS.dec(method)
+            # 使用路由模板而不是实际路径，避免/songs/{song_id}产生无限多的标签
+            route = scope.get("route")
+            route_path = getattr(route, "path", "<unmatched>")
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, method, route_path, str(status["code"]))
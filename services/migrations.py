@@ -0,0 +1,409 @@
+import sqlite3
+from typing import Callable, List, Tuple
+
+# 迁移函数：在迁移事务中执行DDL/DML，不能自行提交（也不能用executescript，它会先提交）
+Migration = Callable[[sqlite3.Connection], None]
+
+
+def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone()
+    return row is not None
+
+
+def _initial_schema(conn: sqlite3.Connection):
+    """乐队表和歌曲表"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS bands (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            description TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # 早于版本管理的旧库已有songs表（band列），由下一个迁移转换
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS songs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            author TEXT,
+            lyrics TEXT,
+            band_id INTEGER NOT NULL REFERENCES bands(id),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _songs_band_id(conn: sqlite3.Connection):
+    """把songs.band（乐队名）迁移为band_id外键，并建立按乐队名读取的视图
+
+    旧数据中bands表里没有的乐队名会先补建乐队（描述为空）。歌曲ID和自增序列保持不变，
+    全文索引按rowid关联，无需重建。
+    """
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(songs)")]
+    if "band" in columns:
+        conn.execute("INSERT OR IGNORE INTO bands (name, description) SELECT DISTINCT band, '' FROM songs")
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'songs'").fetchone()
+        seq = row[0] if row is not None else 0
+        conn.execute('''
+            CREATE TABLE songs_new (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                author TEXT,
+                lyrics TEXT,
+                band_id INTEGER NOT NULL REFERENCES bands(id),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.execute('''
+            INSERT INTO songs_new (id, title, author, lyrics, band_id, created_at, updated_at)
+            SELECT songs.id, songs.title, songs.author, songs.lyrics, bands.id, songs.created_at, songs.updated_at
+            FROM songs JOIN bands ON bands.name = songs.band
+        ''')
+        # 旧表上的触发器随表一起删除，由后续迁移重新创建
+        conn.execute("DROP TABLE songs")
+        conn.execute("ALTER TABLE songs_new RENAME TO songs")
+        conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'songs'", (seq,))
+    # 按乐队过滤；索引隐含rowid，WHERE band_id = ? ORDER BY id无需再排序
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_songs_band_id ON songs(band_id)")
+    # 读接口统一查询该视图，对外仍返回乐队名
+    conn.execute('''
+        CREATE VIEW IF NOT EXISTS songs_with_band AS
+        SELECT songs.id, songs.title, songs.author, songs.lyrics, bands.name AS band,
+               songs.created_at, songs.updated_at
+        FROM songs JOIN bands ON bands.id = songs.band_id
+    ''')
+
+
+def _songs_fts(conn: sqlite3.Connection):
+    """全文检索索引（外部内容表，由触发器与songs保持同步）"""
+    fts_exists = _table_exists(conn, "songs_fts")
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS songs_fts USING fts5(
+            title,
+            lyrics,
+            content='songs',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS songs_fts_ai AFTER INSERT ON songs BEGIN
+            INSERT INTO songs_fts(rowid, title, lyrics)
+            VALUES (new.id, new.title, new.lyrics);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS songs_fts_ad AFTER DELETE ON songs BEGIN
+            INSERT INTO songs_fts(songs_fts, rowid, title, lyrics)
+            VALUES ('delete', old.id, old.title, old.lyrics);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS songs_fts_au AFTER UPDATE OF title, lyrics ON songs BEGIN
+            INSERT INTO songs_fts(songs_fts, rowid, title, lyrics)
+            VALUES ('delete', old.id, old.title, old.lyrics);
+            INSERT INTO songs_fts(rowid, title, lyrics)
+            VALUES (new.id, new.title, new.lyrics);
+        END
+    ''')
+    if not fts_exists:
+        # 已有数据的旧库首次建立索引
+        conn.execute("INSERT INTO songs_fts(songs_fts) VALUES ('rebuild')")
+
+
+def _band_stats(conn: sqlite3.Connection):
+    """每个乐队的歌曲数和最近更新时间，由触发器维护，查询时无需聚合"""
+    stats_exists = _table_exists(conn, "band_stats")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS band_stats (
+            band_id INTEGER PRIMARY KEY REFERENCES bands(id),
+            song_count INTEGER NOT NULL DEFAULT 0,
+            last_updated TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS band_stats_band_ai AFTER INSERT ON bands BEGIN
+            INSERT OR IGNORE INTO band_stats(band_id, song_count) VALUES (new.id, 0);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS band_stats_ai AFTER INSERT ON songs BEGIN
+            UPDATE band_stats SET song_count = song_count + 1, last_updated = new.updated_at
+            WHERE band_id = new.band_id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS band_stats_ad AFTER DELETE ON songs BEGIN
+            UPDATE band_stats SET song_count = song_count - 1,
+                last_updated = strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')
+            WHERE band_id = old.band_id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS band_stats_au AFTER UPDATE ON songs BEGIN
+            UPDATE band_stats SET song_count = song_count - 1, last_updated = new.updated_at
+            WHERE band_id = old.band_id AND old.band_id != new.band_id;
+            UPDATE band_stats SET song_count = song_count + (old.band_id != new.band_id),
+                last_updated = new.updated_at
+            WHERE band_id = new.band_id;
+        END
+    ''')
+    if not stats_exists:
+        # 已有数据的旧库首次建立统计
+        conn.execute('''
+            INSERT INTO band_stats (band_id, song_count, last_updated)
+            SELECT bands.id, COUNT(songs.id), MAX(songs.updated_at)
+            FROM bands LEFT JOIN songs ON songs.band_id = bands.id
+            GROUP BY bands.id
+        ''')
+
+
+def _lyrics_codec(conn: sqlite3.Connection):
+    """歌词可压缩存储：lyrics_codec标记每行的编码，读取统一经过lyrics_text()解码
+
+    songs_with_band视图只在查询选中lyrics列时才调用解码函数。全文索引改为以解码后的视图为内容表，
+    snippet()和'rebuild'读到的是原文；索引需要重建一次。
+    内容视图和触发器同时经过fts_text()切分：unicode61把一整段连续的汉字或假名当作一个词，
+    “唱歌”搜不到“我们一起唱歌吧”，切分后每个汉字、假名是一个词，中日文可以按子串检索。
+    'delete'写入的值与建立索引时一致。
+    """
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(songs)")]
+    if "lyrics_codec" not in columns:
+        conn.execute("ALTER TABLE songs ADD COLUMN lyrics_codec INTEGER NOT NULL DEFAULT 0")
+    conn.execute("DROP VIEW IF EXISTS songs_with_band")
+    conn.execute('''
+        CREATE VIEW songs_with_band AS
+        SELECT songs.id, songs.title, songs.author, lyrics_text(songs.lyrics, songs.lyrics_codec) AS lyrics,
+               bands.name AS band, songs.created_at, songs.updated_at
+        FROM songs JOIN bands ON bands.id = songs.band_id
+    ''')
+    for trigger in ("songs_fts_ai", "songs_fts_ad", "songs_fts_au"):
+        conn.execute("DROP TRIGGER IF EXISTS " + trigger)
+    conn.execute("DROP TABLE IF EXISTS songs_fts")
+    conn.execute("DROP VIEW IF EXISTS songs_fts_content")
+    conn.execute('''
+        CREATE VIEW songs_fts_content AS
+        SELECT id, fts_text(title) AS title, fts_text(lyrics_text(lyrics, lyrics_codec)) AS lyrics FROM songs
+    ''')
+    conn.execute('''
+        CREATE VIRTUAL TABLE songs_fts USING fts5(
+            title,
+            lyrics,
+            content='songs_fts_content',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER songs_fts_ai AFTER INSERT ON songs BEGIN
+            INSERT INTO songs_fts(rowid, title, lyrics)
+            VALUES (new.id, fts_text(new.title), fts_text(lyrics_text(new.lyrics, new.lyrics_codec)));
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER songs_fts_ad AFTER DELETE ON songs BEGIN
+            INSERT INTO songs_fts(songs_fts, rowid, title, lyrics)
+            VALUES ('delete', old.id, fts_text(old.title), fts_text(lyrics_text(old.lyrics, old.lyrics_codec)));
+        END
+    ''')
+    # 只改变编码（压缩已有歌词）时原文不变，不必重建该行的索引
+    conn.execute('''
+        CREATE TRIGGER songs_fts_au AFTER UPDATE OF title, lyrics ON songs
+        WHEN old.title IS NOT new.title
+            OR lyrics_text(old.lyrics, old.lyrics_codec) IS NOT lyrics_text(new.lyrics, new.lyrics_codec)
+        BEGIN
+            INSERT INTO songs_fts(songs_fts, rowid, title, lyrics)
+            VALUES ('delete', old.id, fts_text(old.title), fts_text(lyrics_text(old.lyrics, old.lyrics_codec)));
+            INSERT INTO songs_fts(rowid, title, lyrics)
+            VALUES (new.id, fts_text(new.title), fts_text(lyrics_text(new.lyrics, new.lyrics_codec)));
+        END
+    ''')
+    conn.execute("INSERT INTO songs_fts(songs_fts) VALUES ('rebuild')")
+    # 乐队统计只关心换乐队和更新时间，压缩歌词的UPDATE不应改写last_updated
+    conn.execute("DROP TRIGGER IF EXISTS band_stats_au")
+    conn.execute('''
+        CREATE TRIGGER band_stats_au AFTER UPDATE OF band_id, updated_at ON songs BEGIN
+            UPDATE band_stats SET song_count = song_count - 1, last_updated = new.updated_at
+            WHERE band_id = old.band_id AND old.band_id != new.band_id;
+            UPDATE band_stats SET song_count = song_count + (old.band_id != new.band_id),
+                last_updated = new.updated_at
+            WHERE band_id = new.band_id;
+        END
+    ''')
+
+
+def _change_feed(conn: sqlite3.Connection):
+    """变更流：songs.change_seq记录每行最近一次变更的序号，删除的歌曲留下墓碑
+
+    序号来自单行计数表change_counter，由触发器在插入、更新和删除时递增。写事务串行提交，
+    任何读快照看到的都是序号的一个前缀。只改变存储编码（压缩歌词）的UPDATE不改updated_at，不产生变更。
+    已有的行按(updated_at, id)的顺序补上序号。
+    """
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(songs)")]
+    if "change_seq" not in columns:
+        conn.execute("ALTER TABLE songs ADD COLUMN change_seq INTEGER")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS change_counter (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            seq INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS song_tombstones (
+            id INTEGER PRIMARY KEY,
+            change_seq INTEGER NOT NULL,
+            deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute("INSERT OR IGNORE INTO change_counter (id, seq) VALUES (1, 0)")
+    conn.execute('''
+        UPDATE songs SET change_seq = ordered.seq
+        FROM (
+            SELECT id, (SELECT seq FROM change_counter) + ROW_NUMBER() OVER (ORDER BY updated_at, id) AS seq
+            FROM songs WHERE change_seq IS NULL
+        ) AS ordered
+        WHERE songs.id = ordered.id
+    ''')
+    conn.execute('''
+        UPDATE change_counter SET seq = MAX(seq, (SELECT COALESCE(MAX(change_seq), 0) FROM songs))
+    ''')
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_songs_change_seq ON songs(change_seq)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_song_tombstones_change_seq ON song_tombstones(change_seq)")
+
+    for trigger in ("songs_change_ai", "songs_change_au", "songs_change_ad"):
+        conn.execute("DROP TRIGGER IF EXISTS " + trigger)
+    # 触发器里对change_seq的UPDATE不在任何触发器的UPDATE OF列表中，不会引起连锁触发
+    conn.execute('''
+        CREATE TRIGGER songs_change_ai AFTER INSERT ON songs BEGIN
+            UPDATE change_counter SET seq = seq + 1;
+            UPDATE songs SET change_seq = (SELECT seq FROM change_counter) WHERE id = new.id;
+            DELETE FROM song_tombstones WHERE id = new.id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER songs_change_au AFTER UPDATE OF title, author, band_id, updated_at ON songs BEGIN
+            UPDATE change_counter SET seq = seq + 1;
+            UPDATE songs SET change_seq = (SELECT seq FROM change_counter) WHERE id = new.id;
+        END
+    ''')
+    # 删除时间与应用写入的updated_at一样使用本地时间
+    conn.execute('''
+        CREATE TRIGGER songs_change_ad AFTER DELETE ON songs BEGIN
+            UPDATE change_counter SET seq = seq + 1;
+            INSERT OR REPLACE INTO song_tombstones (id, change_seq, deleted_at)
+            VALUES (old.id, (SELECT seq FROM change_counter), strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime'));
+        END
+    ''')
+
+def _song_list_indexes(conn: sqlite3.Connection):
+    """歌曲列表的组合覆盖索引，列表默认不返回歌词，过滤和排序都不必回表读取带歌词的大行
+
+    按乐队或作者过滤、按ID排序（默认列表和游标分页）用等值列后紧跟id的索引，直接按ID顺序返回，LIMIT取够即停；
+    sort=title用(…, title, id)的索引；不过滤时按标题、创建时间或更新时间排序用以该列开头、紧跟id的索引。
+    以band_id开头的索引取代原来的单列索引（外键检查同样可以使用）。
+    """
+    conn.execute("DROP INDEX IF EXISTS idx_songs_band_id")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_songs_band_id_cover ON songs(band_id, id, title, author, created_at, updated_at)")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_songs_author_id ON songs(author, id, title, band_id, created_at, updated_at)")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_songs_band_title ON songs(band_id, title, id, author, created_at, updated_at)")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_songs_author_title ON songs(author, title, id, band_id, created_at, updated_at)")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_songs_title ON songs(title, id, author, band_id, created_at, updated_at)")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_songs_created_at ON songs(created_at, id, title, author, band_id, updated_at)")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_songs_updated_at ON songs(updated_at, id, title, author, band_id, created_at)")
+
+
+def _iso_timestamps(conn: sqlite3.Connection):
+    """把列默认值CURRENT_TIMESTAMP写入的时间（UTC、以空格分隔）转换为应用使用的本地时间ISO 8601格式
+
+    示例数据曾依赖列默认值，导出和按时间排序时会混入两种格式。只改写符合默认值格式的值。
+    改写updated_at会触发band_stats_au把乐队的last_updated覆盖为该行的时间，先保存、改写后再恢复。
+    """
+    def convert(table: str, column: str):
+        conn.execute(
+            "UPDATE %s SET %s = strftime('%%Y-%%m-%%dT%%H:%%M:%%S', %s, 'localtime') "
+            "WHERE %s GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9] [0-9][0-9]:[0-9][0-9]:[0-9][0-9]'"
+            % (table, column, column, column))
+
+    conn.execute("CREATE TEMP TABLE saved_band_stats AS SELECT band_id, last_updated FROM band_stats")
+    for table, column in (("bands", "created_at"), ("songs", "created_at"), ("songs", "updated_at"),
+                          ("song_tombstones", "deleted_at")):
+        convert(table, column)
+    conn.execute('''
+        UPDATE band_stats SET last_updated = saved.last_updated
+        FROM temp.saved_band_stats AS saved WHERE saved.band_id = band_stats.band_id
+    ''')
+    conn.execute("DROP TABLE temp.saved_band_stats")
+    convert("band_stats", "last_updated")
+
+
+# (版本号, 名称, 迁移函数)，版本号连续递增；已发布的迁移不能再修改，只能追加新迁移。
+# 每个迁移都能在早于版本管理的旧库上安全执行（IF NOT EXISTS或先检查现状）
+MIGRATIONS: List[Tuple[int, str, Migration]] = [
+    (1, "initial_schema", _initial_schema),
+    (2, "songs_band_id", _songs_band_id),
+    (3, "songs_fts", _songs_fts),
+    (4, "band_stats", _band_stats),
+    (5, "lyrics_codec", _lyrics_codec),
+    (6, "change_feed", _change_feed),
+    (7, "song_list_indexes", _song_list_indexes),
+    (8, "iso_timestamps", _iso_timestamps),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    """数据库当前的结构版本，没有schema_version表时为0"""
+    if not _table_exists(conn, "schema_version"):
+        return 0
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> List[Tuple[int, str]]:
+    """把数据库迁移到最新版本，返回本次执行的 [(版本号, 名称)]
+
+    已是最新版本时只做一次查询就返回。需要迁移时在一个BEGIN IMMEDIATE事务中执行全部待执行的迁移，
+    多个进程同时启动时只有一个会真正执行，其余的拿到写锁后发现已是最新版本。
+    """
+    if current_version(conn) >= LATEST_VERSION:
+        return []
+    conn.commit()
+    # 重建表期间必须关闭外键检查，且该PRAGMA在事务内无效；提交前用foreign_key_check补查
+    conn.execute("PRAGMA foreign_keys=OFF")
+    applied = []
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        version = current_version(conn)
+        for number, name, migration in MIGRATIONS:
+            if number <= version:
+                continue
+            migration(conn)
+            conn.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)", (number, name))
+            applied.append((number, name))
+        violations = conn.execute("PRAGMA foreign_key_check").fetchall()
+        if violations:
+            raise sqlite3.IntegrityError("迁移后有 %d 行违反外键约束" % len(violations))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("PRAGMA foreign_keys=ON")
+    return applied
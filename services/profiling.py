@@ -0,0 +1,165 @@
+import asyncio
+import cProfile
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from urllib.parse import unquote
+
+from config import PROFILE_HEADER, PROFILE_SAMPLE_RATE, PROFILE_DIR
+
+# 当前请求各阶段的累计耗时（秒），只在ProfilingMiddleware处理的请求中不为None
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+# 当前请求正在进行的性能分析
+_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("request_profile", default=None)
+
+# Server-Timing中各阶段的顺序
+TIMING_PHASES = ("storage", "validate", "serialize")
+
+
+@contextmanager
+def timed(phase: str):
+    """把代码块的耗时累加到当前请求的phase阶段；不在分析中的请求只多一次ContextVar读取"""
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - start
+
+
+def current_profile() -> Optional["RequestProfile"]:
+    return _profile.get()
+
+
+class RequestProfile:
+    """一次请求的cProfile分析：事件循环线程一个分析器，I/O线程中的存储调用各用一个，结束后合并"""
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self._thread_profilers: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def run_in_thread(self, func, *args, **kwargs):
+        """在I/O线程中分析func；同一线程已有分析器在运行时（Python 3.12起全局只允许一个）直接执行"""
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            return func(*args, **kwargs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
+            with self._lock:
+                self._thread_profilers.append(profiler)
+
+    def dump(self, path: str):
+        stats = pstats.Stats(self.profiler)
+        for profiler in self._thread_profilers:
+            stats.add(profiler)
+        stats.dump_stats(path)
+
+
+def profile_filename(method: str, route: str, query_string: bytes) -> str:
+    """时间戳_方法_路由_查询参数.prof，非文件名字符替换为下划线，过长时截断"""
+    name = "%s_%s" % (method, route.strip("/"))
+    query = unquote(query_string.decode("latin-1"))
+    if query:
+        name += "_" + query
+    name = re.sub(r"[^\w=&.,-]+", "_", name)[:160]
+    return "%s_%03d_%s.prof" % (time.strftime("%Y%m%d-%H%M%S"), int(time.time() * 1000) % 1000, name)
+
+
+class ProfilingMiddleware:
+    """纯ASGI中间件：给响应加上Server-Timing头，并按请求头或抽样率用cProfile分析整个请求
+
+    Server-Timing按storage（等待I/O线程中的存储调用）、validate（按响应模型校验）、
+    serialize（编码JSON）和app（整个请求）给出毫秒数，浏览器开发者工具可以直接显示。
+    带PROFILE_HEADER头（值不为0）或被抽中的请求在cProfile下执行，结果写入profile_dir，
+    可用python -m pstats或snakeviz查看。cProfile开销很大，同一时间只分析一个请求，
+    其余被触发的请求照常处理；事件循环线程的分析结果里也会混入同时处理的其他请求。
+    """
+
+    def __init__(self, app, header: str = PROFILE_HEADER, sample_rate: float = PROFILE_SAMPLE_RATE,
+                 profile_dir: str = PROFILE_DIR):
+        self.app = app
+        self.header = header.lower().encode("latin-1")
+        self.sample_rate = sample_rate
+        self.profile_dir = profile_dir
+        self._profiling = False
+
+    def _wants_profile(self, scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == self.header:
+                return value not in (b"", b"0")
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = {}
+        timings_token = _timings.set(timings)
+        profile = None
+        if not self._profiling and self._wants_profile(scope):
+            self._profiling = True
+            profile = RequestProfile()
+        profile_token = _profile.set(profile)
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                timings["app"] = time.perf_counter() - start
+                message["headers"] = list(message.get("headers", [])) + \
+                    [(b"server-timing", self._server_timing(timings))]
+            await send(message)
+
+        try:
+            if profile is None:
+                await self.app(scope, receive, send_wrapper)
+            else:
+                profile.profiler.enable()
+                try:
+                    await self.app(scope, receive, send_wrapper)
+                finally:
+                    profile.profiler.disable()
+        finally:
+            _profile.reset(profile_token)
+            _timings.reset(timings_token)
+            if profile is not None:
+                try:
+                    await self._dump(profile, scope)
+                finally:
+                    self._profiling = False
+
+    @staticmethod
+    def _server_timing(timings: Dict[str, float]) -> bytes:
+        parts = ["%s;dur=%.3f" % (phase, timings[phase] * 1000) for phase in TIMING_PHASES if phase in timings]
+        parts.append("app;dur=%.3f" % (timings["app"] * 1000))
+        return ", ".join(parts).encode("latin-1")
+
+    async def _dump(self, profile: RequestProfile, scope):
+        """在默认线程池中写入分析结果，不阻塞事件循环"""
+        route = getattr(scope.get("route"), "path", scope["path"])
+        path = os.path.join(self.profile_dir, profile_filename(scope["method"], route, scope["query_string"]))
+
+        def write():
+            os.makedirs(self.profile_dir, exist_ok=True)
+            profile.dump(path)
+
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, write)
+        except OSError as e:
+            print("性能分析结果写入失败:", e)
+            return
+        print("性能分析结果已写入", path)
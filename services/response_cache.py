@@ -0,0 +1,110 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from config import RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_BYTES
+from services.json_response import dumps, validated_json
+
+
+class ResponseCache:
+    """序列化后响应体的LRU缓存，同时限制条目数和总字节数"""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[bytes, str]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Tuple[bytes, str]]:
+        """返回 (响应体, ETag)，未命中返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Hashable, body: bytes) -> Tuple[bytes, str]:
+        """缓存响应体并返回 (响应体, ETag)"""
+        etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+        entry = (body, etag)
+        if len(body) > self.max_bytes:
+            return entry
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._entries[key] = entry
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+        return entry
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """判断If-None-Match头是否与ETag匹配（弱比较）"""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == "*" or tag == etag:
+            return True
+    return False
+
+
+async def cached_json_response(
+    request: Request,
+    cache: ResponseCache,
+    data_version: int,
+    build: Callable[[], Awaitable[Any]],
+    response_type: Any = None,
+    exclude_unset: bool = False
+) -> Response:
+    """按(路径, 查询参数, 数据版本)返回缓存的JSON响应，支持ETag和304
+
+    build只在缓存未命中时调用。指定response_type时build可以直接返回存储层的原始数据，
+    由validated_json校验一次并编码；否则其返回值按FastAPI的规则编码为JSON。
+    数据版本变化后旧条目不会再被命中，随LRU自然淘汰。
+    """
+    key = (request.url.path, tuple(sorted(request.query_params.multi_items())), data_version)
+    entry = cache.get(key)
+    if entry is None:
+        content = await build()
+        if response_type is not None:
+            body = validated_json(response_type, content, exclude_unset=exclude_unset)
+        else:
+            body = dumps(jsonable_encoder(content, exclude_unset=exclude_unset))
+        entry = cache.put(key, body)
+    body, etag = entry
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
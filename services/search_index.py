@@ -0,0 +1,68 @@
+import heapq
+from typing import Dict, Set, List, Tuple, Optional
+
+
+class NGramIndex:
+    """字符n-gram倒排索引，用于模糊搜索前剪枝候选集合"""
+
+    def __init__(self, n: int = 2):
+        self.n = n
+        self._postings: Dict[str, Set[int]] = {}
+        self._doc_grams: Dict[int, Set[str]] = {}
+
+    def _grams(self, text: str) -> Set[str]:
+        """把文本切分为n-gram，首尾加空格以便短词和词首词尾也能命中"""
+        text = " " + (text or "").lower().strip() + " "
+        if len(text) <= self.n:
+            return {text}
+        return {text[i:i + self.n] for i in range(len(text) - self.n + 1)}
+
+    def add(self, doc_id: int, text: str):
+        """加入或替换一个文档"""
+        self.remove(doc_id)
+        grams = self._grams(text)
+        self._doc_grams[doc_id] = grams
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(doc_id)
+
+    def remove(self, doc_id: int):
+        """删除一个文档"""
+        grams = self._doc_grams.pop(doc_id, None)
+        if grams is None:
+            return
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(doc_id)
+                if not posting:
+                    del self._postings[gram]
+
+    def clear(self):
+        """清空索引"""
+        self._postings.clear()
+        self._doc_grams.clear()
+
+    def candidates(
+        self,
+        query: str,
+        max_candidates: Optional[int] = None,
+        min_shared: float = 0.3
+    ) -> List[Tuple[int, float]]:
+        """返回与查询共享n-gram最多的文档及其Dice相似度，只遍历命中的倒排表
+
+        共享的n-gram少于查询n-gram数量min_shared比例的文档直接被剪掉。
+        """
+        query_grams = self._grams(query)
+        counts: Dict[int, int] = {}
+        for gram in query_grams:
+            for doc_id in self._postings.get(gram, ()):
+                counts[doc_id] = counts.get(doc_id, 0) + 1
+        threshold = min_shared * len(query_grams)
+        scored = [
+            (doc_id, 2.0 * shared / (len(query_grams) + len(self._doc_grams[doc_id])))
+            for doc_id, shared in counts.items()
+            if shared >= threshold
+        ]
+        if max_candidates is None:
+            return sorted(scored, key=lambda item: item[1], reverse=True)
+        return heapq.nlargest(max_candidates, scored, key=lambda item: item[1])
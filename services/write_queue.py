@@ -0,0 +1,110 @@
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from queue import Queue, Empty
+from typing import Any, Callable, List, Tuple
+
+from config import DB_WRITE_BATCH_SIZE, DB_WRITE_BATCH_DELAY_MS
+from services.db_pool import ConnectionPool
+from services.metrics import DB_WRITE_BATCH_OPS, DB_WRITE_QUEUE_WAIT
+
+# 写操作：接收连接，在其上执行语句并返回结果，不能自行提交或回滚
+WriteOperation = Callable[[sqlite3.Connection], Any]
+
+
+class WriteQueue:
+    """SQLite组提交：单个写线程把排队的写操作合并到一个事务中提交
+
+    每个操作在自己的SAVEPOINT中执行，单个操作失败只回滚它自己，不影响同批的其他操作。
+    事务提交成功后才设置各调用方Future的结果，因此每次写入仍是单独确认的。
+    """
+
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        max_batch: int = DB_WRITE_BATCH_SIZE,
+        max_delay: float = DB_WRITE_BATCH_DELAY_MS / 1000
+    ):
+        self.pool = pool
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: Queue = Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, operation: WriteOperation) -> Future:
+        """把写操作放入队列，返回在所在事务提交后完成的Future"""
+        if self._closed:
+            raise RuntimeError("写队列已关闭")
+        future = Future()
+        self._queue.put((operation, future, time.perf_counter()))
+        return future
+
+    def close(self):
+        """处理完已入队的操作后停止写线程"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _loop(self):
+        """写线程：取到第一个操作后，最多再等max_delay秒或凑满max_batch个操作"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stop = False
+            deadline = time.perf_counter() + self.max_delay
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+                except Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._commit_batch(batch)
+            if stop:
+                return
+
+    def _commit_batch(self, batch: List[Tuple[WriteOperation, Future, float]]):
+        """在一个事务中执行一批操作并提交，再逐个确认"""
+        outcomes = []
+        try:
+            with self.pool.connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                for operation, future, _ in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    conn.execute("SAVEPOINT write_op")
+                    try:
+                        result = operation(conn)
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO write_op")
+                        conn.execute("RELEASE write_op")
+                        outcomes.append((future, None, e))
+                    else:
+                        conn.execute("RELEASE write_op")
+                        outcomes.append((future, result, None))
+                conn.commit()
+        except Exception as e:
+            # 事务整体失败（如磁盘已满），同批的所有操作都没有生效
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        DB_WRITE_BATCH_OPS.observe(len(batch))
+        now = time.perf_counter()
+        for _, _, enqueued in batch:
+            DB_WRITE_QUEUE_WAIT.observe(now - enqueued)
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
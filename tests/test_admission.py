@@ -0,0 +1,60 @@
+import asyncio
+import unittest
+
+from config import ADMISSION_LIMITS
+from services.admission import AdmissionMiddleware
+
+
+class StreamingAdmissionTest(unittest.TestCase):
+    """流式导出在整个传输期间占用名额，但只占用自己的限制，不会让普通列表请求返回503"""
+
+    def setUp(self):
+        self.release = None
+
+    async def app(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        if scope["path"] == "/api/songs/export":
+            # 导出的响应体还没有发完
+            await self.release.wait()
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    @staticmethod
+    async def request(middleware, path: str) -> int:
+        status = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+
+        scope = {"type": "http", "method": "GET", "path": path, "headers": [], "query_string": b""}
+        await middleware(scope, receive, send)
+        return status[0]
+
+    def test_default_limits_separate_streaming_endpoints(self):
+        middleware = AdmissionMiddleware(self.app, ADMISSION_LIMITS)
+        for path in ("/api/songs/export", "/api/songs/bulk"):
+            self.assertEqual(middleware._match(path).prefix, path)
+        self.assertEqual(middleware._match("/api/songs/1").prefix, "/api/songs")
+
+    def test_held_export_does_not_block_list_requests(self):
+        async def scenario():
+            self.release = asyncio.Event()
+            middleware = AdmissionMiddleware(self.app, "/api/songs/export=1:0,/api/songs=1:0", queue_timeout=0.05)
+            export = asyncio.create_task(self.request(middleware, "/api/songs/export"))
+            await asyncio.sleep(0)
+            # 导出占着自己的名额：第二个导出被拒绝，列表请求照常处理
+            self.assertEqual(await self.request(middleware, "/api/songs/export"), 503)
+            self.assertEqual(await self.request(middleware, "/api/songs"), 200)
+            self.assertEqual(await self.request(middleware, "/api/songs"), 200)
+            self.release.set()
+            self.assertEqual(await export, 200)
+            self.assertEqual(await self.request(middleware, "/api/songs/export"), 200)
+
+        asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    unittest.main()
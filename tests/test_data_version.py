@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from services.db_manager import DatabaseManager
+
+
+class DataVersionTest(unittest.TestCase):
+    """数据版本号从数据库读取，其他连接（另一个worker、管理命令）的写入也会让缓存和ETag失效"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cwd = os.getcwd()
+        # 路由模块按默认的相对路径data/band.db创建存储，在临时目录中导入并建立连接
+        os.chdir(cls.tmp.name)
+        try:
+            from routers import band_with_db
+            cls.storage = band_with_db.db_manager
+            cls.storage.manager.initialize()
+            cls.storage.manager.seed()
+        finally:
+            os.chdir(cwd)
+        app = FastAPI()
+        app.include_router(band_with_db.router)
+        cls.client = TestClient(app)
+        cls.other = DatabaseManager(os.path.join(cls.tmp.name, "data", "band.db"))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.other.close()
+        cls.storage.shutdown()
+        cls.tmp.cleanup()
+
+    def etag(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response.headers["etag"]
+
+    def test_write_through_other_connection_changes_etag(self):
+        etag = self.etag("/api/songs")
+        self.assertEqual(self.client.get("/api/songs", headers={"If-None-Match": etag}).status_code, 304)
+        self.other.create_song({"title": "壱雫空", "author": None, "band": "MyGO!!!!!", "lyrics": None})
+        self.assertEqual(self.client.get("/api/songs", headers={"If-None-Match": etag}).status_code, 200)
+        self.assertNotEqual(self.etag("/api/songs"), etag)
+
+    def test_update_and_delete_through_other_connection(self):
+        song = self.other.create_song({"title": "影色舞", "author": None, "band": "MyGO!!!!!", "lyrics": None})
+        etag = self.etag("/api/songs/changes")
+        self.other.update_song(song["id"], {"title": "影色舞 (Live)", "author": None, "lyrics": None, "band": None})
+        updated = self.etag("/api/songs/changes")
+        self.assertNotEqual(updated, etag)
+        self.other.delete_song(song["id"])
+        self.assertNotEqual(self.etag("/api/songs/changes"), updated)
+
+    def test_new_band_changes_band_list(self):
+        etag = self.etag("/api/bands")
+        with self.other.get_connection() as conn:
+            conn.execute("INSERT INTO bands (name, description) VALUES ('CRYCHIC', '')")
+            conn.commit()
+        self.assertNotEqual(self.etag("/api/bands"), etag)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+
+from services.db_manager import DatabaseManager
+
+
+class CJKFullTextSearchTest(unittest.TestCase):
+    """全文检索按子串匹配中文和日文的标题、歌词"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.manager = DatabaseManager(os.path.join(self.tmp.name, "band.db"))
+        self.manager.initialize()
+        self.manager.seed()
+        self.manager.create_song({"title": "春日影", "author": None, "band": "MyGO!!!!!",
+                                  "lyrics": "悴んだ心 ふるえる眼差し 世界で 僕は ひとりぼっちだった"})
+        self.manager.create_song({"title": "Sing along", "author": None, "band": "MyGO!!!!!",
+                                  "lyrics": "我们一起唱歌吧 la la la"})
+
+    def tearDown(self):
+        self.manager.close()
+        self.tmp.cleanup()
+
+    def titles(self, q):
+        songs, total = self.manager.search_songs(q, fields=["id", "title"])
+        self.assertEqual(total, len(songs))
+        return [song["title"] for song in songs]
+
+    def test_chinese_substring_in_lyrics(self):
+        self.assertEqual(self.titles("唱歌"), ["Sing along"])
+        self.assertEqual(self.titles('"一起唱"'), ["Sing along"])
+
+    def test_substring_of_title(self):
+        self.assertEqual(self.titles("日影"), ["春日影"])
+
+    def test_kana_substring(self):
+        self.assertEqual(self.titles("ぼっち"), ["春日影"])
+
+    def test_characters_must_be_adjacent_and_in_order(self):
+        self.assertEqual(self.titles("影日"), [])
+
+    def test_snippet_has_no_separators(self):
+        songs, _ = self.manager.search_songs("唱歌", fields=["id"])
+        self.assertIn("我们一起<mark>唱歌</mark>吧", songs[0]["snippet"])
+
+    def test_index_follows_updates(self):
+        song_id = self.manager.search_songs("日影", fields=["id"])[0][0]["id"]
+        self.manager.update_song(song_id, {"title": "碧天伴走", "author": None, "lyrics": None, "band": None})
+        self.assertEqual(self.titles("日影"), [])
+        self.assertEqual(self.titles("天伴"), ["碧天伴走"])
+
+
+if __name__ == "__main__":
+    unittest.main()
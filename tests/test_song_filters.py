@@ -0,0 +1,39 @@
+import os
+import tempfile
+import unittest
+
+from services.db_manager import DatabaseManager
+
+
+class TitlePrefixFilterTest(unittest.TestCase):
+    """title_prefix写成范围条件，末字符加一后的上界不能落进代理区"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.manager = DatabaseManager(os.path.join(self.tmp.name, "band.db"))
+        self.manager.initialize()
+        self.manager.seed()
+        for title in ("A퟿", "A퟿2", "A", "B\U0010ffff", "B\U0010ffffx", "C"):
+            self.manager.create_song({"title": title, "author": None, "band": "MyGO!!!!!", "lyrics": None})
+
+    def tearDown(self):
+        self.manager.close()
+        self.tmp.cleanup()
+
+    def titles(self, prefix):
+        songs, total, _ = self.manager.get_songs(title_prefix=prefix, fields=["id", "title"], page_size=100)
+        self.assertEqual(total, len(songs))
+        return sorted(song["title"] for song in songs)
+
+    def test_prefix_before_surrogates(self):
+        self.assertEqual(self.titles("A퟿"), ["A퟿", "A퟿2"])
+
+    def test_prefix_ending_with_max_code_point(self):
+        self.assertEqual(self.titles("B\U0010ffff"), ["B\U0010ffff", "B\U0010ffffx"])
+
+    def test_plain_prefix(self):
+        self.assertEqual(self.titles("A"), ["A퟿", "A퟿2", "A"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+from itertools import combinations
+from typing import Iterator, List, Tuple
+
+from models.bangdream_models import DEFAULT_SONG_LIST_FIELDS
+from services.db_manager import DatabaseManager, SONG_SORT_COLUMNS
+
+# 有索引直接按排序顺序返回行的 (过滤条件, 排序字段)，这些组合的分页查询不应出现临时B树排序；
+# 不过滤时任何排序字段都有对应的索引
+INDEX_ORDERED = {
+    (("band",), "id"), (("band",), "title"),
+    (("author",), "id"), (("author",), "title"),
+    (("title",), "id"), (("title",), "title"),
+}
+
+
+def song_list_combinations():
+    """歌曲列表支持的全部 (过滤条件, 排序字段, 是否降序, 字段, after_id) 组合"""
+    filters = ("band", "title", "author", "title_prefix")
+    for size in range(len(filters) + 1):
+        for names in combinations(filters, size):
+            for sort in SONG_SORT_COLUMNS:
+                for descending in (False, True):
+                    for fields in (None, DEFAULT_SONG_LIST_FIELDS):
+                        yield names, sort, descending, fields, None
+                        if sort == "id" and not descending:
+                            yield names, sort, descending, fields, 1
+
+
+def plan_problems(plan: List[str], names, sort: str) -> List[str]:
+    """找出查询计划中的问题：有过滤条件却扫描songs，或本该由索引保证顺序却用临时B树排序"""
+    filtered = bool(names)
+    ordered = not filtered or (tuple(names), sort) in INDEX_ORDERED
+    problems = []
+    for detail in plan:
+        if filtered and detail.startswith("SCAN songs"):
+            problems.append(detail)
+        elif not filtered and detail == "SCAN songs" and sort != "id":
+            problems.append(detail)
+        elif ordered and detail.startswith("USE TEMP B-TREE"):
+            problems.append(detail)
+    return problems
+
+
+def song_list_plans(manager: DatabaseManager) -> Iterator[Tuple[str, str, List[str], List[str]]]:
+    """逐条给出歌曲列表查询的 (组合说明, SQL, 查询计划, 问题)；manage.py check-indexes也用它检查实际的数据库"""
+    with manager.get_connection() as conn:
+        for names, sort, descending, fields, after_id in song_list_combinations():
+            filters = {name: "x" for name in names}
+            queries = manager.song_list_queries(sort=sort, descending=descending, fields=fields, after_id=after_id,
+                                                **filters)
+            (count_sql, count_params), (sql, params) = queries
+            description = "过滤=%s 排序=%s%s 字段=%s after_id=%s" % (
+                ",".join(names) or "无", sort, " desc" if descending else "",
+                "全部" if fields is None else "列表", after_id)
+            for query, query_params in ((count_sql, count_params), (sql, params + [11, 0])):
+                plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + query, query_params)]
+                yield description, query, plan, plan_problems(plan, names, sort)
+
+
+class SongListPlanTest(unittest.TestCase):
+    """歌曲列表各种过滤和排序组合都走索引，没有全表扫描和多余的排序"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.manager = DatabaseManager(os.path.join(self.tmp.name, "band.db"))
+        self.manager.initialize()
+        self.manager.seed()
+
+    def tearDown(self):
+        self.manager.close()
+        self.tmp.cleanup()
+
+    def test_no_full_scans_or_temp_btrees(self):
+        checked = 0
+        for description, query, plan, problems in song_list_plans(self.manager):
+            checked += 1
+            with self.subTest(description, query=query):
+                self.assertEqual(problems, [], " | ".join(plan))
+        self.assertGreater(checked, 0)
+
+    def test_checker_flags_unindexed_order(self):
+        # 检查本身要能发现问题：按作者过滤、按创建时间排序没有对应索引，允许排序但不允许扫描
+        self.assertEqual(plan_problems(["SCAN songs"], ("band",), "id"), ["SCAN songs"])
+        self.assertEqual(plan_problems(["USE TEMP B-TREE FOR ORDER BY"], ("band",), "title"),
+                         ["USE TEMP B-TREE FOR ORDER BY"])
+        self.assertEqual(plan_problems(["USE TEMP B-TREE FOR ORDER BY"], ("author",), "created_at"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
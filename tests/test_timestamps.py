@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timezone
+
+from services.db_manager import DatabaseManager
+from services.migrations import _iso_timestamps
+
+
+class TimestampFormatTest(unittest.TestCase):
+    """示例数据和接口写入的行使用同一种时间格式（本地时间ISO 8601），导出时不会混用两种格式"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.manager = DatabaseManager(os.path.join(self.tmp.name, "band.db"))
+        self.manager.initialize()
+
+    def tearDown(self):
+        self.manager.close()
+        self.tmp.cleanup()
+
+    def assertIsoFormat(self, value):
+        self.assertIn("T", value)
+        datetime.fromisoformat(value)
+
+    def test_seed_and_api_rows_export_same_format(self):
+        self.manager.seed()
+        self.manager.create_song({"title": "春日影", "author": None, "band": "MyGO!!!!!", "lyrics": None})
+        songs = [song for batch in self.manager.iter_song_batches() for song in batch]
+        self.assertEqual(len(songs), 3)
+        for song in songs:
+            self.assertIsoFormat(song["created_at"])
+            self.assertIsoFormat(song["updated_at"])
+        for band in self.manager.get_all_bands(with_stats=True):
+            self.assertIsoFormat(band["created_at"])
+
+    def test_migration_converts_default_timestamps(self):
+        self.manager.seed()
+        with self.manager.get_connection() as conn:
+            # 旧版本的示例数据依赖列默认值
+            conn.execute("UPDATE songs SET created_at = '2026-01-02 03:04:05', updated_at = '2026-01-02 03:04:05' "
+                         "WHERE title = '黑色生日'")
+            conn.execute("UPDATE band_stats SET last_updated = '2026-05-06T07:08:09' "
+                         "WHERE band_id = (SELECT id FROM bands WHERE name = 'Ave Mujica')")
+            _iso_timestamps(conn)
+            conn.commit()
+        song = self.manager.get_songs(title="黑色生日")[0][0]
+        # CURRENT_TIMESTAMP是UTC，转换为与datetime.now()一致的本地时间
+        expected = datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+        self.assertEqual(song["created_at"], expected.isoformat())
+        self.assertEqual(song["updated_at"], expected.isoformat())
+        # 改写updated_at不会把乐队的最近更新时间倒退
+        band = self.manager.get_band_by_name("Ave Mujica", with_stats=True)
+        self.assertEqual(band["last_updated"], "2026-05-06T07:08:09")
+
+
+if __name__ == "__main__":
+    unittest.main()